@@ -0,0 +1,55 @@
+import random
+import re
+import time
+from typing import List
+
+from django.test import SimpleTestCase
+from django.utils.datastructures import OrderedSet
+
+from thoughts.hashtags import unique_hashtags, unique_hashtags_many
+
+
+ROUNDS = 20
+THOUGHTS = 1000
+THOUGHT_LENGTH = 800
+
+
+def legacy_unique_hashtags(text: str) -> List[str]:
+    hashtags = re.findall(r'#(\w+)', text)
+    return list(OrderedSet(hashtags))
+
+
+def build_thought(rand: random.Random) -> str:
+    words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'Ação', 'café']
+    hashtags = ['#Lorem', '#ipsum', '#DolorSit', '#amet2021', '#Ação', '#café', '#Elit']
+    parts, length = [], 0
+    while length < THOUGHT_LENGTH:
+        part = rand.choice(hashtags) if rand.random() < 0.1 else rand.choice(words)
+        parts.append(part)
+        length += len(part) + 1
+    return ' '.join(parts)[:THOUGHT_LENGTH]
+
+
+class HashtagsBenchmark(SimpleTestCase):
+    """Per-thought cost of extracting hashtags from 800 characters thoughts."""
+
+    def setUp(self) -> None:
+        rand = random.Random(42)
+        self.texts = [build_thought(rand) for _ in range(THOUGHTS)]
+
+    def measure(self, tokenize) -> float:
+        started_at = time.perf_counter()
+        for _ in range(ROUNDS):
+            tokenize(self.texts)
+        return (time.perf_counter() - started_at) / ROUNDS / THOUGHTS
+
+    def test_unique_hashtags(self):
+        timings = {
+            'findall + OrderedSet': self.measure(lambda texts: [legacy_unique_hashtags(text) for text in texts]),
+            'compiled + casefold': self.measure(lambda texts: [unique_hashtags(text) for text in texts]),
+            'unique_hashtags_many': self.measure(unique_hashtags_many),
+        }
+
+        print(f'\nhashtags of {THOUGHTS} thoughts, {THOUGHT_LENGTH} characters each:')
+        for name, timing in timings.items():
+            print(f'  {name + ":":22} {timing * 1e6:8.1f} us/thought')
@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from common.testing.builders import UserBuilder
+from thoughts.models import Thought
+
+
+ROUNDS = 500
+
+
+class RequestMetricsBenchmark(TestCase):
+    """Per-request cost of measuring a request, on a cached timeline page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .build()
+        user.save()
+        Thought.objects.bulk_create(Thought(thought=f'Thought number {number}', owner=user) for number in range(100))
+
+    def measure(self, sample_rate: float) -> float:
+        client = APIClient()
+        url = reverse('thought-list') + '?username=breninho'
+        with override_settings(REQUEST_METRICS_SAMPLE_RATE=sample_rate):
+            client.get(url)
+            started_at = time.perf_counter()
+            for _ in range(ROUNDS):
+                client.get(url)
+            return (time.perf_counter() - started_at) / ROUNDS
+
+    def test_request_metrics_overhead(self):
+        cache.clear()
+        unmeasured = self.measure(0)
+        measured = self.measure(1)
+
+        print(
+            f'\ncached timeline page, {ROUNDS} requests:'
+            f'\n  not sampled: {unmeasured * 1e6:8.1f} us/request'
+            f'\n  sampled:     {measured * 1e6:8.1f} us/request'
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.test import TestCase
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from common.testing.builders import UserBuilder
+
+
+THOUGHTS = 100
+
+
+class ThoughtCreateBenchmark(TestCase):
+    """Per-thought cost of publishing thoughts one by one and in bulk."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .build()
+        cls.user.save()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.thoughts = [
+            {'thought': f'Thought number {number} #lorem #ipsum{number % 10}'}
+            for number in range(THOUGHTS)
+        ]
+
+    def test_thought_create(self):
+        batch_size = min(THOUGHTS, settings.THOUGHTS_BULK_MAX)
+
+        started_at = time.perf_counter()
+        for thought in self.thoughts:
+            self.client.post(reverse('thought-list'), thought, format='json')
+        one_by_one = (time.perf_counter() - started_at) / THOUGHTS
+
+        started_at = time.perf_counter()
+        for start in range(0, THOUGHTS, batch_size):
+            self.client.post(reverse('thought-bulk-create'), self.thoughts[start:start + batch_size], format='json')
+        bulk = (time.perf_counter() - started_at) / THOUGHTS
+
+        print(
+            f'\nthought create, {THOUGHTS} thoughts:'
+            f'\n  POST /api/thoughts per thought:           {one_by_one * 1e6:8.1f} us/thought'
+            f'\n  POST /api/thoughts/bulk, {batch_size:3} per request: {bulk * 1e6:8.1f} us/thought'
+        )
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+
+from django.test import TestCase
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+from common.testing.builders import UserBuilder
+from thoughts.models import Thought
+from thoughts.serializers import ThoughtRowSerializer, ThoughtSerializer, UserSerializer
+
+
+ROUNDS = 50
+
+
+class ReverseUserSerializer(UserSerializer):
+    url = serializers.HyperlinkedIdentityField('user-detail')
+
+
+class ReverseThoughtSerializer(ThoughtSerializer):
+    user = ReverseUserSerializer(source='owner', read_only=True)
+    url = serializers.HyperlinkedIdentityField('thought-detail')
+
+
+class ThoughtListBenchmark(TestCase):
+    """Per-item cost of serializing one default-sized page of thoughts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .build()
+        cls.user.save()
+        Thought.objects.bulk_create(
+            Thought(thought=f'Thought number {number} #lorem #ipsum', owner=cls.user)
+            for number in range(api_settings.PAGE_SIZE)
+        )
+
+    def setUp(self) -> None:
+        request = APIRequestFactory().get('/api/thoughts', {'username': self.user.username})
+        self.context = {'request': Request(request), 'format': None}
+
+    def measure(self, serializer_class, queryset) -> float:
+        started_at = time.perf_counter()
+        for _ in range(ROUNDS):
+            serializer_class(list(queryset), many=True, context=self.context).data
+        return (time.perf_counter() - started_at) / ROUNDS / api_settings.PAGE_SIZE
+
+    def test_thought_list_page(self):
+        lazy_owners = Thought.objects.filter(owner=self.user)
+        joined_owners = lazy_owners.select_related('owner')
+
+        before = self.measure(ReverseThoughtSerializer, lazy_owners)
+        after = self.measure(ThoughtSerializer, joined_owners)
+
+        print(
+            f'\nthought list, {api_settings.PAGE_SIZE} items per page:'
+            f'\n  lazy owners + reverse() per item: {before * 1e6:8.1f} us/item'
+            f'\n  select_related + cached reverse:  {after * 1e6:8.1f} us/item'
+        )
+
+    def test_thought_list_fast_path(self):
+        queryset = Thought.objects.filter(owner=self.user)
+
+        def model_serializer():
+            data = ThoughtSerializer(list(queryset.select_related('owner')), many=True, context=self.context).data
+            return CamelCaseJSONRenderer().render(OrderedDict([('next', None), ('results', data)]))
+
+        def row_serializer():
+            rows = list(queryset.values(*ThoughtRowSerializer.values_fields))
+            data = ThoughtRowSerializer(rows, many=True, context=self.context).data
+            return JSONRenderer().render(OrderedDict([('next', None), ('results', data)]))
+
+        self.assertEqual(model_serializer(), row_serializer())
+        timings = {}
+        for name, render in (('model serializer + camelize', model_serializer),
+                             ('values() rows, camelCased', row_serializer)):
+            started_at = time.perf_counter()
+            for _ in range(ROUNDS):
+                render()
+            timings[name] = (time.perf_counter() - started_at) / ROUNDS / api_settings.PAGE_SIZE
+
+        print(f'\nthought list rendered to JSON, {api_settings.PAGE_SIZE} items per page:')
+        for name, timing in timings.items():
+            print(f'  {name + ":":30} {timing * 1e6:8.1f} us/item')
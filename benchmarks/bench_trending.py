@@ -0,0 +1,72 @@
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from thoughts.trending import cache_trending_hashtags, compute_trending_hashtags
+
+
+HASHTAGS = int(os.environ.get('BENCH_TRENDING_HASHTAGS', 2000))
+REQUESTS = 1000
+
+
+class TrendingHashtagsBenchmark(TestCase):
+    """Trending hashtags over a week of usage buckets for HASHTAGS tags.
+
+    The usage rows stand for the thoughts published in that week; they are
+    seeded directly since the endpoint never reads thoughts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO thoughts_hashtag (hashtag, created_at) "
+                "SELECT 'tag' || n, now() FROM generate_series(1, %s) n",
+                [HASHTAGS]
+            )
+            lengths = {}
+            for length, resolution in settings.TRENDING_WINDOWS.values():
+                lengths[resolution] = max(lengths.get(resolution, 0), length)
+            for resolution, length in lengths.items():
+                # A Zipf-like spread: tag n is used about 10000 / n times per bucket.
+                cursor.execute(
+                    "INSERT INTO thoughts_hashtagusage (hashtag_id, resolution, bucket, count) "
+                    "SELECT h.id, %s, to_timestamp(floor(extract(epoch FROM now()) / %s) * %s - b * %s), "
+                    "       greatest(1, 10000 / (row_number() OVER (PARTITION BY b ORDER BY h.id))) "
+                    "FROM thoughts_hashtag h CROSS JOIN generate_series(0, %s) b",
+                    [resolution, resolution, resolution, resolution, length // resolution]
+                )
+            cursor.execute("ANALYZE thoughts_hashtagusage")
+            cursor.execute("SELECT count(*) FROM thoughts_hashtagusage")
+            cls.usage_rows = cursor.fetchone()[0]
+
+    def test_trending_hashtags(self):
+        print(f'\ntrending hashtags, {HASHTAGS} hashtags, {self.usage_rows} usage buckets:')
+        for window in settings.TRENDING_WINDOWS:
+            started_at = time.perf_counter()
+            compute_trending_hashtags(window)
+            computed_in = time.perf_counter() - started_at
+
+            cache.clear()
+            cache_trending_hashtags()
+            client = APIClient()
+            url = reverse('hashtag-trending')
+            timings = []
+            for _ in range(REQUESTS):
+                started_at = time.perf_counter()
+                client.get(url, {'window': window})
+                timings.append(time.perf_counter() - started_at)
+            timings.sort()
+
+            print(
+                f'  {window:>3}: rollup query {computed_in * 1e3:7.1f} ms, '
+                f'cached response p50 {statistics.median(timings) * 1e3:5.2f} ms, '
+                f'p99 {timings[int(len(timings) * 0.99)] * 1e3:5.2f} ms'
+            )
@@ -0,0 +1,304 @@
+"""Load test of the public API against a local gunicorn, compared with a stored baseline.
+
+Seed a dedicated database once, then run the scenarios against it:
+
+    $ export DATABASE_URL=postgres://postgres@localhost:5432/thoughts_bench
+    $ python benchmarks/loadtest.py seed --users 10000 --thoughts 10000000
+    $ python benchmarks/loadtest.py run --baseline benchmarks/baseline.json
+
+Each scenario runs for ``--duration`` seconds with ``--clients`` concurrent
+keep-alive clients. Throughput, latency percentiles and database queries
+per request (read from the ``Server-Timing`` header) are compared with the
+baseline; the run exits with status 1 when a scenario is slower than the
+baseline by more than ``--tolerance``, runs more queries, or fails
+requests. ``--save-baseline`` stores the results as the new baseline.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+
+ROOT = Path(__file__).resolve().parent.parent
+PASSWORD = 'benchmark'
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'thoughtsapi.settings')
+    import django
+    django.setup()
+
+
+def seed(args):
+    """Insert ``args.users`` users and ``args.thoughts`` thoughts spread over a year.
+
+    Each thought carries one hashtag out of ``args.hashtags``, drawn with a
+    Zipfian spread: the k-th hashtag is used about 1/k as often as the first.
+    """
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from common.testing.builders import BulkHashtagBuilder, BulkThoughtBuilder, BulkUserBuilder
+    from thoughts.counters import reconcile_hashtag_thought_counts, reconcile_user_thought_counts
+    from thoughts.models import Hashtag, Thought
+
+    call_command('migrate', verbosity=0)
+    tables = [User._meta.db_table, Thought._meta.db_table, Hashtag._meta.db_table]
+    if User.objects.exists() or Thought.objects.exists():
+        if not args.reset:
+            sys.exit(f'{connection.settings_dict["NAME"]} already has users or thoughts, pass --reset to empty it.')
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {", ".join(tables)} RESTART IDENTITY CASCADE')
+
+    started_at = time.perf_counter()
+    user_ids = BulkUserBuilder(args.users).with_prefix('bench').with_password(PASSWORD).copy()
+    hashtag_ids = BulkHashtagBuilder(args.hashtags).copy()
+    BulkThoughtBuilder(args.thoughts).with_owners(user_ids)\
+                                     .with_hashtags(hashtag_ids)\
+                                     .with_interval(timedelta(days=365) / args.thoughts)\
+                                     .copy()
+    reconcile_user_thought_counts()
+    reconcile_hashtag_thought_counts()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'seeded {args.users} users and {args.thoughts} thoughts in {time.perf_counter() - started_at:.0f}s')
+
+
+def get_scale() -> dict:
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Max, Min
+    from thoughts.models import Thought
+
+    thoughts = Thought.objects.aggregate(first=Min('id'), last=Max('id'))
+    return {
+        'users': User.objects.filter(username__startswith='bench').count(),
+        'first_thought_id': thoughts['first'],
+        'last_thought_id': thoughts['last'],
+    }
+
+
+class Server:
+    """A gunicorn serving the API on a free local port."""
+
+    def __init__(self, workers: int):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        env = {
+            **os.environ,
+            'WEB_CONCURRENCY': str(workers),
+            'WEB_MAX_REQUESTS': '0',
+            'REQUEST_METRICS_SAMPLE_RATE': '1',
+            'LOGLEVEL': os.environ.get('LOGLEVEL', 'WARNING'),
+            # Signups flush their confirmation emails in process instead of through the broker.
+            'CELERY_TASK_ALWAYS_EAGER': '1',
+            'EMAIL_BACKEND': 'django.core.mail.backends.dummy.EmailBackend',
+            'ALLOWED_HOSTS': '*',
+        }
+        self.process = subprocess.Popen(
+            ['gunicorn', 'thoughtsapi.wsgi', '-c', 'gunicorn.py', '-b', f'127.0.0.1:{self.port}'],
+            cwd=ROOT,
+            env=env
+        )
+
+    def __enter__(self):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                connection.request('GET', '/')
+                connection.getresponse().read()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        sys.exit('gunicorn did not start')
+
+    def __exit__(self, *args):
+        self.process.send_signal(signal.SIGTERM)
+        self.process.wait()
+
+
+def scenarios(scale: dict) -> dict:
+    def username():
+        return f'bench{random.randrange(scale["users"])}'
+
+    def thought_list():
+        return 'GET', '/api/thoughts?' + urlencode({'username': username()}), None
+
+    def thought_detail():
+        return 'GET', f'/api/thoughts/{random.randint(scale["first_thought_id"], scale["last_thought_id"])}/', None
+
+    def user_create():
+        name = f'load{uuid.uuid4().hex[:12]}'
+        user = {
+            'username': name,
+            'password': PASSWORD,
+            'email': f'{name}@bench.com',
+            'firstName': 'Load',
+            'lastName': 'Test',
+        }
+        return 'POST', '/api/users/', user
+
+    def token():
+        return 'POST', '/api/token', {'username': username(), 'password': PASSWORD}
+
+    return {
+        'thought-list': thought_list,
+        'thought-detail': thought_detail,
+        'user-create': user_create,
+        'token': token,
+    }
+
+
+def drive(port: int, make_request, clients: int, duration: float) -> dict:
+    stop = threading.Event()
+
+    def client():
+        results = []
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while not stop.is_set():
+            method, path, body = make_request()
+            payload = None if body is None else json.dumps(body)
+            started_at = time.perf_counter()
+            try:
+                connection.request(method, path, payload, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                results.append((0, time.perf_counter() - started_at, None))
+                continue
+            match = QUERIES_RE.search(response.getheader('Server-Timing', ''))
+            results.append((response.status, time.perf_counter() - started_at, int(match.group(1)) if match else None))
+        connection.close()
+        return results
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures = [executor.submit(client) for _ in range(clients)]
+        time.sleep(duration)
+        stop.set()
+        results = [result for future in futures for result in future.result()]
+
+    latencies = sorted(latency for _, latency, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'requests': len(results),
+        'throughput': round(len(results) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1e3, 1),
+        'p90_ms': round(percentile(latencies, 0.90) * 1e3, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1e3, 1),
+        'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+        'errors': sum(1 for status, _, _ in results if not 200 <= status < 300),
+    }
+
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def compare(name: str, result: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    if result['errors']:
+        regressions.append(f'{result["errors"]} failed requests')
+    if baseline is None:
+        return regressions
+    if result['throughput'] < baseline['throughput'] * (1 - tolerance):
+        regressions.append(f'throughput {result["throughput"]} < baseline {baseline["throughput"]} req/s')
+    if result['p99_ms'] > baseline['p99_ms'] * (1 + tolerance):
+        regressions.append(f'p99 {result["p99_ms"]} > baseline {baseline["p99_ms"]} ms')
+    if (result['queries_per_request'] or 0) > (baseline['queries_per_request'] or 0) + 0.5:
+        regressions.append(f'{result["queries_per_request"]} > baseline {baseline["queries_per_request"]} queries')
+    return regressions
+
+
+def run(args):
+    scale = get_scale()
+    if not scale['users'] or scale['first_thought_id'] is None:
+        sys.exit('The database has no benchmark data, run the seed command first.')
+    baseline = json.loads(Path(args.baseline).read_text()) if Path(args.baseline).exists() else None
+    if baseline and (baseline['workers'], baseline['clients']) != (args.workers, args.clients):
+        print(f'warning: the baseline was recorded with {baseline["workers"]} workers and {baseline["clients"]} clients')
+    if baseline and baseline['scale']['users'] != scale['users']:
+        print(f'warning: the baseline was recorded with {baseline["scale"]["users"]} users')
+
+    selected = args.scenario or list(scenarios(scale))
+    results = {}
+    failed = False
+    with Server(args.workers) as server:
+        for name in selected:
+            make_request = scenarios(scale)[name]
+            drive(server.port, make_request, args.clients, min(args.duration, 2))
+            result = results[name] = drive(server.port, make_request, args.clients, args.duration)
+            regressions = compare(name, result, (baseline or {}).get('results', {}).get(name), args.tolerance)
+            failed = failed or bool(regressions)
+            print(
+                f'{name + ":":16} {result["throughput"]:8.1f} req/s'
+                f'  p50 {result["p50_ms"]:7.1f} ms  p90 {result["p90_ms"]:7.1f} ms  p99 {result["p99_ms"]:7.1f} ms'
+                f'  {result["queries_per_request"]} queries/request  {result["errors"]} errors'
+                + ''.join(f'\n  REGRESSION: {regression}' for regression in regressions),
+                flush=True
+            )
+
+    if args.save_baseline:
+        recorded = {
+            'scale': {'users': scale['users'], 'thoughts': scale['last_thought_id'] - scale['first_thought_id'] + 1},
+            'workers': args.workers,
+            'clients': args.clients,
+            'duration': args.duration,
+            'results': results,
+        }
+        Path(args.baseline).write_text(json.dumps(recorded, indent=2) + '\n')
+        print(f'saved baseline to {args.baseline}')
+    elif failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='seed the database of DATABASE_URL')
+    seed_parser.add_argument('--users', type=int, default=10000)
+    seed_parser.add_argument('--thoughts', type=int, default=10000000)
+    seed_parser.add_argument('--hashtags', type=int, default=5000)
+    seed_parser.add_argument('--reset', action='store_true', help='empty the users and thoughts tables first')
+
+    run_parser = commands.add_parser('run', help='run the scenarios and compare them with the baseline')
+    run_parser.add_argument('--baseline', default=str(ROOT / 'benchmarks' / 'baseline.json'))
+    run_parser.add_argument('--save-baseline', action='store_true')
+    run_parser.add_argument('--scenario', action='append', choices=['thought-list', 'thought-detail', 'user-create', 'token'])
+    run_parser.add_argument('--workers', type=int, default=2)
+    run_parser.add_argument('--clients', type=int, default=16)
+    run_parser.add_argument('--duration', type=float, default=15)
+    run_parser.add_argument('--tolerance', type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
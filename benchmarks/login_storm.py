@@ -0,0 +1,100 @@
+"""Read latency of a running server with and without a concurrent login storm.
+
+    $ python benchmarks/login_storm.py http://localhost:8000 --username breno --password breno
+
+Reads list the thoughts of ``--username`` while ``--logins`` clients keep
+obtaining tokens for the same account. Logins refused with 503 are the
+hashing pool's backpressure, not failures.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+def request(url, data=None):
+    body = None if data is None else json.dumps(data).encode()
+    headers = {'Content-Type': 'application/json'}
+    started_at = time.perf_counter()
+    try:
+        with urlopen(Request(url, data=body, headers=headers)) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    return status, time.perf_counter() - started_at
+
+
+def hammer(call, clients, stop):
+    def client():
+        results = []
+        while not stop.is_set():
+            results.append(call())
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=clients)
+    return executor, [executor.submit(client) for _ in range(clients)]
+
+
+def run(read, login, readers, logins, duration):
+    stop = threading.Event()
+    read_executor, read_futures = hammer(read, readers, stop)
+    login_executor, login_futures = hammer(login, logins, stop) if logins else (None, [])
+    time.sleep(duration)
+    stop.set()
+    reads = [result for future in read_futures for result in future.result()]
+    login_results = [result for future in login_futures for result in future.result()]
+    read_executor.shutdown()
+    if login_executor:
+        login_executor.shutdown()
+    return reads, login_results
+
+
+def describe(name, results, duration):
+    latencies = sorted(latency for _, latency in results)
+    statuses = Counter(status for status, _ in results)
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    print(
+        f'  {name + ":":8} {len(results) / duration:7.1f} req/s'
+        f'  p50 {statistics.median(latencies) * 1e3 if latencies else 0:7.1f} ms'
+        f'  p99 {p99 * 1e3:7.1f} ms'
+        f'  statuses {dict(statuses)}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    credentials = {'username': args.username, 'password': args.password}
+
+    def read():
+        return request(f'{url}/api/thoughts?username={args.username}&offset=0&limit=10')
+
+    def login():
+        return request(f'{url}/api/token', credentials)
+
+    print(f'reads alone, {args.readers} clients, {args.duration}s:')
+    reads, _ = run(read, login, args.readers, 0, args.duration)
+    describe('reads', reads, args.duration)
+
+    print(f'reads during a login storm of {args.logins} clients:')
+    reads, logins = run(read, login, args.readers, args.logins, args.duration)
+    describe('reads', reads, args.duration)
+    describe('logins', logins, args.duration)
+
+
+if __name__ == '__main__':
+    main()
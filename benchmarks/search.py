@@ -0,0 +1,121 @@
+"""Latency of thought searches on a seeded database, and the indexes they use.
+
+    $ export DATABASE_URL=postgres://postgres@localhost:5432/thoughts_bench
+    $ python benchmarks/loadtest.py seed
+    $ python benchmarks/search.py
+
+Searches run from words as rare as one thought to words in every thought.
+Each one reads the first page of results, as ``/api/thoughts/search`` does,
+``--rounds`` times in a row; its plan is printed with the indexes it scans.
+The run exits with status 1 when a search is slower than ``--budget``
+milliseconds at p95 or scans the whole thoughts table.
+
+Words of middling frequency are the slowest: the planner weighs walking
+``thought_recent_idx`` against reading every match found by the GIN index,
+and picks well only when its cost settings fit the server, which are printed.
+"""
+import argparse
+import json
+import sys
+import time
+
+from loadtest import get_scale, percentile
+
+
+def searches(scale: dict) -> dict:
+    middle_id = (scale['first_thought_id'] + scale['last_thought_id']) // 2
+    return {
+        'one thought': str(middle_id),
+        'rare hashtag': 'tag4999',
+        'uncommon hashtag': 'tag300',
+        'middling hashtag': 'tag100',
+        'common hashtag': 'tag30',
+        'top hashtag': 'tag0',
+        'every thought': 'thought number',
+        'two words, one thought': f'number {middle_id}',
+        'no thought': 'saci',
+    }
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def planner_settings() -> str:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, setting FROM pg_settings WHERE name = ANY(%s) ORDER BY name",
+            [['max_parallel_workers_per_gather', 'random_page_cost', 'shared_buffers']]
+        )
+        return ', '.join(f'{name} {setting}' for name, setting in cursor.fetchall())
+
+
+def explain(queryset) -> dict:
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--budget', type=float, default=50, help='p95 latency budget, in milliseconds')
+    args = parser.parse_args()
+
+    scale = get_scale()
+    if scale['first_thought_id'] is None:
+        sys.exit('The database has no benchmark data, run `loadtest.py seed` first.')
+
+    from rest_framework.settings import api_settings
+    from thoughts.models import Thought
+    from thoughts.search import search_thoughts
+    from thoughts.serializers import ThoughtRowSerializer
+
+    thoughts = Thought._meta.db_table
+    print(f'planner: {planner_settings()}')
+    print(f'{scale["last_thought_id"] - scale["first_thought_id"] + 1} thoughts, first page of {api_settings.PAGE_SIZE}:')
+    failed = False
+    for name, text in searches(scale).items():
+        queryset = search_thoughts(text).values(*ThoughtRowSerializer.values_fields, 'rank')\
+                                        .order_by('-rank', '-id')[:api_settings.PAGE_SIZE + 1]
+        latencies = []
+        for _ in range(args.rounds):
+            started_at = time.perf_counter()
+            rows = list(queryset.all())
+            latencies.append(time.perf_counter() - started_at)
+        latencies.sort()
+        p95 = percentile(latencies, 0.95) * 1e3
+
+        nodes = list(plan_nodes(explain(queryset)))
+        indexes = sorted({node['Index Name'] for node in nodes if 'Index Name' in node})
+        full_scan = any(node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == thoughts for node in nodes)
+        problems = []
+        if p95 > args.budget:
+            problems.append(f'p95 {p95:.1f} > {args.budget} ms')
+        if full_scan:
+            problems.append(f'sequential scan of {thoughts}')
+        failed = failed or bool(problems)
+        print(
+            f'  {name + ":":24} {text!r:18} {len(rows):4} rows'
+            f'  p50 {percentile(latencies, 0.50) * 1e3:6.1f} ms  p95 {p95:6.1f} ms'
+            f'  indexes {", ".join(indexes) or "none"}'
+            + ''.join(f'\n    SLOW: {problem}' for problem in problems),
+            flush=True
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Read latency and throughput of a running server, to compare serving modes.
+
+    $ gunicorn thoughtsapi.wsgi -c gunicorn.py
+    $ python benchmarks/serving_modes.py http://localhost:8000 --username breno
+    $ gunicorn thoughtsapi.asgi -c gunicorn.py -k uvicorn.workers.UvicornWorker
+    $ python benchmarks/serving_modes.py http://localhost:8000 --username breno
+
+``--clients`` clients keep reading the first timeline page of
+``--username`` and the thoughts on it.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+from login_storm import describe, hammer, request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    list_url = f'{args.url.rstrip("/")}/api/thoughts?username={args.username}'
+    with urlopen(list_url) as response:
+        detail_urls = [thought['url'] for thought in json.load(response)['results']]
+    urls = itertools.cycle([list_url] + detail_urls)
+    next_url = threading.Lock()
+
+    def read():
+        with next_url:
+            url = next(urls)
+        return request(url)
+
+    stop = threading.Event()
+    executor, futures = hammer(read, args.clients, stop)
+    time.sleep(args.duration)
+    stop.set()
+    reads = [result for future in futures for result in future.result()]
+    executor.shutdown()
+
+    print(f'reads, {args.clients} clients, {args.duration}s:')
+    describe('reads', reads, args.duration)
+
+
+if __name__ == '__main__':
+    main()
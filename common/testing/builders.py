@@ -1,7 +1,27 @@
-from typing import Union
+import random
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import accumulate, islice
+from typing import Iterator, Sequence, Tuple, Union
 
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from thoughts.models import Hashtag, HashtagThought, Thought
+
+
+def hash_password(password: str) -> str:
+    """``make_password`` computed once per password and hasher list; users built with it share the salt."""
+    return _hash_password(password, tuple(settings.PASSWORD_HASHERS))
+
+
+@lru_cache(maxsize=None)
+def _hash_password(password: str, hashers: tuple) -> str:
+    return make_password(password)
 
 
 class UserBuilder:
@@ -31,7 +51,7 @@ class UserBuilder:
         return self
 
     def with_password(self, password: str) -> 'UserBuilder':
-        self.user.password = make_password(password)
+        self.user.password = hash_password(password)
         return self
 
     def _as_json(self) -> dict:
@@ -42,3 +62,232 @@ class UserBuilder:
             'email': self.user.email,
             'password': self.user.password
         }
+
+
+def reserve_ids(model, count: int) -> range:
+    """Take ``count`` consecutive primary keys from the sequence of ``model``'s table.
+
+    Rows inserted with reserved ids can be referenced before they are read
+    back. Other writers of the table must not insert meanwhile.
+    """
+    if not count:
+        return range(0)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [model._meta.db_table])
+        first = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)",
+            [model._meta.db_table, first + count - 1]
+        )
+    return range(first, first + count)
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class _CopyStream:
+    """File-like view of ``rows`` in COPY text format, encoded as ``read`` asks for it."""
+
+    def __init__(self, rows: Iterator[tuple]):
+        self._rows = rows
+        self._buffer = bytearray()
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += ('\t'.join(map(_copy_value, row)) + '\n').encode()
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+def copy_rows(model, fields: Sequence[str], rows: Iterator[tuple]):
+    """Stream ``rows`` (values of ``fields``, by attname) into ``model``'s table with COPY."""
+    columns = ', '.join(model._meta.get_field(field).column for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {model._meta.db_table} ({columns}) FROM STDIN', _CopyStream(rows))
+
+
+def insert_rows(model, fields: Sequence[str], rows: Iterator[tuple], batch_size: int):
+    """Insert ``rows`` (values of ``fields``, by attname) with multi-row INSERTs of ``batch_size`` rows.
+
+    Unlike ``bulk_create`` it keeps the given values of ``auto_now_add`` fields.
+    """
+    columns = ', '.join(model._meta.get_field(field).column for field in fields)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            execute_values(cursor.cursor, f'INSERT INTO {model._meta.db_table} ({columns}) VALUES %s', batch,
+                           page_size=batch_size)
+
+
+class BulkBuilder:
+    """Builds ``count`` rows of ``model`` as a stream, never holding them all in memory.
+
+    ``create`` inserts them with multi-row INSERTs and ``copy`` with COPY,
+    which is several times faster for large tables. Both return the ids of the new
+    rows. Neither sends model signals, so caches, feeds, hashtag usage and
+    thought counts are left untouched; thoughts.counters reconciles the counts.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def rows(self, ids: range) -> Iterator[tuple]:
+        raise NotImplementedError
+
+    def create(self, batch_size: int = 1000) -> range:
+        ids = reserve_ids(self.model, self.count)
+        insert_rows(self.model, self.fields, self.rows(ids), batch_size)
+        return ids
+
+    def copy(self) -> range:
+        ids = reserve_ids(self.model, self.count)
+        copy_rows(self.model, self.fields, self.rows(ids))
+        return ids
+
+
+class BulkUserBuilder(BulkBuilder):
+    """Users ``{prefix}{number}`` sharing one precomputed password hash."""
+    model = User
+    fields = (
+        'id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+        'email', 'is_staff', 'is_active', 'date_joined'
+    )
+
+    def __init__(self, count: int):
+        super(BulkUserBuilder, self).__init__(count)
+        self.prefix = 'user'
+        self.password = hash_password('123456')
+
+    def with_prefix(self, prefix: str) -> 'BulkUserBuilder':
+        self.prefix = prefix
+        return self
+
+    def with_password(self, password: str) -> 'BulkUserBuilder':
+        self.password = hash_password(password)
+        return self
+
+    def rows(self, ids: range) -> Iterator[tuple]:
+        joined_at = timezone.now()
+        for number, pk in enumerate(ids):
+            username = f'{self.prefix}{number}'
+            yield (
+                pk, self.password, False, username, 'Bulk', 'User',
+                f'{username}@thoughts.com', False, True, joined_at
+            )
+
+
+class BulkHashtagBuilder(BulkBuilder):
+    """Hashtags ``{prefix}{number}``."""
+    model = Hashtag
+    fields = ('id', 'hashtag', 'created_at', 'thought_count')
+
+    def __init__(self, count: int):
+        super(BulkHashtagBuilder, self).__init__(count)
+        self.prefix = 'tag'
+
+    def with_prefix(self, prefix: str) -> 'BulkHashtagBuilder':
+        self.prefix = prefix.lower()
+        return self
+
+    def rows(self, ids: range) -> Iterator[tuple]:
+        created_at = timezone.now()
+        for number, pk in enumerate(ids):
+            yield pk, f'{self.prefix}{number}', created_at, 0
+
+
+class BulkThoughtBuilder(BulkBuilder):
+    """Thoughts of random owners, one every ``interval`` up to now, each
+    tagged with one hashtag drawn with a Zipfian spread.
+
+    The n-th hashtag of ``with_hashtags`` is used about 1/n**skew as often as
+    the first. Draws come from a generator seeded with ``seed``, so a builder
+    always produces the same rows.
+    """
+    model = Thought
+    fields = ('id', 'owner_id', 'thought', 'created_at')
+    link_fields = ('hashtag_id', 'thought_id', 'thought_created_at')
+
+    def __init__(self, count: int):
+        super(BulkThoughtBuilder, self).__init__(count)
+        self.owner_ids = []
+        self.hashtag_ids = []
+        self.skew = 1.0
+        self.interval = timedelta(seconds=1)
+        self.newest = timezone.now()
+        self.seed = 0
+
+    def with_owners(self, owner_ids: Sequence[int]) -> 'BulkThoughtBuilder':
+        self.owner_ids = owner_ids
+        return self
+
+    def with_hashtags(self, hashtag_ids: Sequence[int], skew: float = 1.0) -> 'BulkThoughtBuilder':
+        self.hashtag_ids = hashtag_ids
+        self.skew = skew
+        return self
+
+    def with_interval(self, interval: timedelta) -> 'BulkThoughtBuilder':
+        self.interval = interval
+        return self
+
+    def with_seed(self, seed: int) -> 'BulkThoughtBuilder':
+        self.seed = seed
+        return self
+
+    def draws(self, ids: range) -> Iterator[Tuple[int, int, int, datetime]]:
+        """(thought id, owner id, hashtag id or None, created at) of every thought."""
+        rand = random.Random(self.seed)
+        cum_weights = list(accumulate(1 / rank ** self.skew for rank in range(1, len(self.hashtag_ids) + 1)))
+        for number, pk in enumerate(ids):
+            owner_id = self.owner_ids[rand.randrange(len(self.owner_ids))]
+            hashtag_id = rand.choices(self.hashtag_ids, cum_weights=cum_weights)[0] if cum_weights else None
+            yield pk, owner_id, hashtag_id, self.newest - (len(ids) - number - 1) * self.interval
+
+    def rows(self, ids: range) -> Iterator[tuple]:
+        # Read before streaming: the connection cannot query in the middle of a COPY.
+        return self._rows(ids, self._hashtag_names())
+
+    def _rows(self, ids: range, names: dict) -> Iterator[tuple]:
+        for pk, owner_id, hashtag_id, created_at in self.draws(ids):
+            text = f'Thought number {pk}'
+            if hashtag_id is not None:
+                text += f' #{names[hashtag_id]}'
+            yield pk, owner_id, text, created_at
+
+    def link_rows(self, ids: range) -> Iterator[tuple]:
+        for pk, _, hashtag_id, created_at in self.draws(ids):
+            if hashtag_id is not None:
+                yield hashtag_id, pk, created_at
+
+    def create(self, batch_size: int = 1000) -> range:
+        ids = super(BulkThoughtBuilder, self).create(batch_size)
+        insert_rows(HashtagThought, self.link_fields, self.link_rows(ids), batch_size)
+        return ids
+
+    def copy(self) -> range:
+        ids = super(BulkThoughtBuilder, self).copy()
+        copy_rows(HashtagThought, self.link_fields, self.link_rows(ids))
+        return ids
+
+    def _hashtag_names(self) -> dict:
+        names = {}
+        for start in range(0, len(self.hashtag_ids), 10000):
+            chunk = list(self.hashtag_ids[start:start + 10000])
+            names.update(Hashtag.objects.filter(id__in=chunk).values_list('id', 'hashtag'))
+        return names
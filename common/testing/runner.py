@@ -0,0 +1,81 @@
+import time
+import unittest
+
+from django.test.runner import (
+    DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner, default_test_processes
+)
+
+
+class TimedRemoteTestResult(RemoteTestResult):
+    """Sends the duration of each test run in a worker back as an ``addDuration`` event."""
+
+    def startTest(self, test):
+        self._started_at = time.perf_counter()
+        super(TimedRemoteTestResult, self).startTest(test)
+
+    def stopTest(self, test):
+        self.events.append(('addDuration', self.test_index, time.perf_counter() - self._started_at))
+        super(TimedRemoteTestResult, self).stopTest(test)
+
+
+class TimedRemoteTestRunner(RemoteTestRunner):
+    resultclass = TimedRemoteTestResult
+
+
+class TimedParallelTestSuite(ParallelTestSuite):
+    runner_class = TimedRemoteTestRunner
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    """Records how long each test took, measured here or reported by a worker."""
+
+    def __init__(self, *args, **kwargs):
+        super(TimedTextTestResult, self).__init__(*args, **kwargs)
+        self.durations = {}
+
+    def startTest(self, test):
+        self._started_at = time.perf_counter()
+        super(TimedTextTestResult, self).startTest(test)
+
+    def addDuration(self, test, elapsed: float):
+        self.durations[test.id()] = elapsed
+
+    def stopTest(self, test):
+        super(TimedTextTestResult, self).stopTest(test)
+        # Events replayed from a worker carry their duration already.
+        self.durations.setdefault(test.id(), time.perf_counter() - self._started_at)
+
+
+class TimedTestRunner(DiscoverRunner):
+    """Runs the suite on one cloned database per CPU and reports the slowest tests.
+
+    ``--parallel 1`` runs it serially on a single database; ``--slowest 0``
+    turns the report off.
+    """
+    parallel_test_suite = TimedParallelTestSuite
+
+    def __init__(self, slowest: int = 10, **kwargs):
+        super(TimedTestRunner, self).__init__(**kwargs)
+        self.slowest = slowest
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super(TimedTestRunner, cls).add_arguments(parser)
+        parser.set_defaults(parallel=default_test_processes())
+        parser.add_argument(
+            '--slowest', type=int, default=10,
+            help='Number of slowest tests to report, 0 to report none.'
+        )
+
+    def get_resultclass(self):
+        return super(TimedTestRunner, self).get_resultclass() or TimedTextTestResult
+
+    def run_suite(self, suite, **kwargs):
+        result = super(TimedTestRunner, self).run_suite(suite, **kwargs)
+        durations = getattr(result, 'durations', {})
+        if self.slowest and durations:
+            slowest = sorted(durations.items(), key=lambda item: item[1], reverse=True)[:self.slowest]
+            result.stream.writeln(f'\nSlowest {len(slowest)} tests:')
+            for test_id, elapsed in slowest:
+                result.stream.writeln(f'  {elapsed:7.3f}s  {test_id}')
+        return result
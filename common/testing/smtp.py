@@ -0,0 +1,67 @@
+import socketserver
+import threading
+from typing import Iterable, List
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line: str):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server: LocalSMTPServer = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost ESMTP')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                message = []
+                for data in iter(self.rfile.readline, b''):
+                    if data == b'.\r\n':
+                        break
+                    message.append(data.decode())
+                with server.lock:
+                    server.messages.append(''.join(message))
+                self.reply('250 OK')
+            elif command == 'RCPT' and any(address in line for address in server.refused):
+                self.reply('550 No such user')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP stand-in on a free local port that records connections and messages.
+
+    Recipients in ``refused`` are rejected, as a server rejects unknown users.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refused: Iterable[str] = ()):
+        super(LocalSMTPServer, self).__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.refused = tuple(refused)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages: List[str] = []
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
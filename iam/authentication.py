@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Union
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from iam.models import RevokedToken
+
+
+class UserRowCache:
+    """In-process LRU of ``auth.User`` rows that expire after ``timeout`` seconds."""
+
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pk: int) -> User:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rows.get(pk)
+            if entry is not None and entry[0] > now:
+                self._rows.move_to_end(pk)
+                return entry[1]
+
+        try:
+            user = User.objects.get(pk=pk)
+        except User.DoesNotExist:
+            # The token outlived its user, as JWTAuthentication.get_user reports.
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        with self._lock:
+            self._rows[pk] = (now + self.timeout, user)
+            self._rows.move_to_end(pk)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+        return user
+
+    def evict(self, pk: int):
+        with self._lock:
+            self._rows.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+user_rows = UserRowCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TIMEOUT)
+
+
+class TokenDenylist:
+    """Unexpired revoked token ids, reloaded from the database at most every ``timeout`` seconds."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._jtis = frozenset()
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti: str) -> bool:
+        if time.monotonic() >= self._expires_at:
+            self.reload()
+        return jti in self._jtis
+
+    def reload(self):
+        with self._lock:
+            self._jtis = frozenset(
+                RevokedToken.objects.filter(expires_at__gt=timezone.now())
+                                    .values_list('jti', flat=True)
+            )
+            self._expires_at = time.monotonic() + self.timeout
+
+    def revoke(self, token):
+        jti = token[api_settings.JTI_CLAIM]
+        RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'expires_at': datetime.fromtimestamp(token['exp'], tz=timezone.utc)}
+        )
+        with self._lock:
+            self._jtis = self._jtis | {jti}
+
+    def clear(self):
+        with self._lock:
+            self._jtis = frozenset()
+            self._expires_at = 0
+
+
+denylist = TokenDenylist(settings.AUTH_DENYLIST_CACHE_TIMEOUT)
+
+
+class ClaimsUser(TokenUser):
+    """Authenticated user built from the signed claims of an access token."""
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+
+def get_user_row(user: Union[User, TokenUser]) -> User:
+    """The ``auth.User`` row of an authenticated user, for code paths that need the model."""
+    if isinstance(user, User):
+        return user
+    return user_rows.get(user.id)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        token = super(ClaimsTokenObtainPairSerializer, cls).get_token(user)
+        token['username'] = user.username
+        token['is_active'] = user.is_active
+        return token
+
+
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if refresh[api_settings.JTI_CLAIM] in denylist:
+            raise InvalidToken('Token is revoked')
+        if api_settings.USER_ID_CLAIM not in refresh:
+            raise InvalidToken('Token contained no recognizable user identification')
+        # The access token copies the refresh token's claims, so they are
+        # re-read from the user row: a deactivated user can not refresh and a
+        # renamed one gets the new username.
+        user = user_rows.get(refresh[api_settings.USER_ID_CLAIM])
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        refresh['username'] = user.username
+        refresh['is_active'] = user.is_active
+        return super(DenylistTokenRefreshSerializer, self).validate({**attrs, 'refresh': str(refresh)})
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the token claims instead of loading the user.
+
+    Tokens issued before the ``username`` claim existed fall back to loading
+    the user from the database.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super(StatelessJWTAuthentication, self).get_validated_token(raw_token)
+        if validated_token.get(api_settings.JTI_CLAIM) in denylist:
+            raise InvalidToken('Token is revoked')
+        return validated_token
+
+    def get_user(self, validated_token) -> Optional[Union[User, ClaimsUser]]:
+        if 'username' not in validated_token:
+            return super(StatelessJWTAuthentication, self).get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        user = ClaimsUser(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
@@ -0,0 +1,90 @@
+from smtplib import SMTPRecipientsRefused
+from typing import List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from iam.models import ConfirmationEmail
+
+
+FLUSH_SCHEDULED_KEY = 'emails:confirmation:flush-scheduled'
+
+
+def queue_confirmation_email(email: str):
+    """Buffer a confirmation email; the first one of a flush interval schedules the flush."""
+    ConfirmationEmail.objects.create(email=email)
+    transaction.on_commit(schedule_flush)
+
+
+def schedule_flush():
+    from iam.tasks import send_confirmation_emails
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, settings.EMAIL_FLUSH_INTERVAL):
+        send_confirmation_emails.apply_async(countdown=settings.EMAIL_FLUSH_INTERVAL)
+
+
+def release_flush():
+    """Let the next signup schedule a flush, scheduling one now if emails are still buffered.
+
+    Signups committed while a flush drained the buffer found the flush
+    scheduled and scheduled nothing; their emails are sent by the new one.
+    """
+    cache.delete(FLUSH_SCHEDULED_KEY)
+    if ConfirmationEmail.objects.filter(refused_at=None).exists():
+        schedule_flush()
+
+
+def build_confirmation_message(email: str, connection) -> EmailMessage:
+    return EmailMessage(
+        subject='Confirm your thoughts account',
+        body='Welcome to thoughts! Your account is ready.',
+        to=[email],
+        connection=connection
+    )
+
+
+def send_pending_confirmation_emails() -> int:
+    """Send every buffered email in batches of EMAIL_BATCH_SIZE over one connection.
+
+    Rows are locked with SKIP LOCKED, so concurrent flushes split the
+    pending emails instead of sending them twice. Emails are sent one by one:
+    a refused recipient is set aside, and on any other error the emails
+    already sent are deleted before it is raised, so a retry does not resend
+    them.
+    """
+    sent = 0
+    connection = get_connection()
+    try:
+        while True:
+            error = None
+            with transaction.atomic():
+                batch: List[ConfirmationEmail] = list(
+                    ConfirmationEmail.objects.select_for_update(skip_locked=True)
+                                             .filter(refused_at=None)
+                                             .order_by('id')[:settings.EMAIL_BATCH_SIZE]
+                )
+                if not batch:
+                    break
+                # Opens on the first batch only; later batches reuse the connection.
+                connection.open()
+                sent_ids, refused_ids = [], []
+                for pending in batch:
+                    try:
+                        connection.send_messages([build_confirmation_message(pending.email, connection)])
+                    except SMTPRecipientsRefused:
+                        refused_ids.append(pending.id)
+                    except OSError as smtp_error:
+                        error = smtp_error
+                        break
+                    else:
+                        sent_ids.append(pending.id)
+                ConfirmationEmail.objects.filter(id__in=sent_ids).delete()
+                ConfirmationEmail.objects.filter(id__in=refused_ids).update(refused_at=timezone.now())
+            sent += len(sent_ids)
+            if error is not None:
+                raise error
+    finally:
+        connection.close()
+    return sent
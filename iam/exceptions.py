@@ -1,6 +1,18 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
 class UsernameError(Exception):
     pass
 
 
 class EmailError(Exception):
     pass
+
+
+class PasswordHashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins and signups right now, try again shortly.'
+    default_code = 'password_hashing_unavailable'
+    # Sent back as the Retry-After header by DRF's exception handler.
+    wait = 1
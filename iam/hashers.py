@@ -0,0 +1,73 @@
+import threading
+from concurrent import futures
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.crypto import constant_time_compare
+
+from iam.exceptions import PasswordHashingUnavailable
+
+
+def _is_gevent_patched() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class PasswordHashingPool:
+    """Runs password hashing on a bounded pool of native threads.
+
+    Under gevent, hashing on the request greenlet would block every other
+    greenlet of the worker, so it goes to gevent's native thread pool and
+    the greenlet yields while it waits. At most ``size`` hashes run at once
+    and ``backlog`` more may wait; past that PasswordHashingUnavailable is
+    raised instead of queueing without bound.
+    """
+
+    def __init__(self, size: int, backlog: int):
+        self.size = size
+        self.backlog = backlog
+        self._slots = threading.BoundedSemaphore(size + backlog)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get_executor(self) -> futures.Executor:
+        with self._lock:
+            if self._executor is None:
+                if _is_gevent_patched():
+                    from gevent.threadpool import ThreadPoolExecutor
+                else:
+                    from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.size)
+            return self._executor
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingUnavailable()
+        try:
+            return self.get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+pool = PasswordHashingPool(settings.PASSWORD_HASHING_POOL_SIZE, settings.PASSWORD_HASHING_BACKLOG)
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher that hashes and checks passwords on the hashing pool."""
+
+    def encode(self, password, salt, iterations=None):
+        return pool.run(super(PooledPBKDF2PasswordHasher, self).encode, password, salt, iterations)
+
+    def verify(self, password, encoded):
+        return pool.run(self._verify, password, encoded)
+
+    def _verify(self, password, encoded):
+        # PBKDF2PasswordHasher.verify calls self.encode, which would wait on
+        # the pool from inside it.
+        algorithm, iterations, salt, hash = encoded.split('$', 3)
+        assert algorithm == self.algorithm
+        encoded_2 = PBKDF2PasswordHasher.encode(self, password, salt, int(iterations))
+        return constant_time_compare(encoded, encoded_2)
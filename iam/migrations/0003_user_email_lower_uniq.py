@@ -0,0 +1,48 @@
+from django.core.management.base import CommandError
+from django.db import migrations
+
+
+INDEX_NAME = 'auth_user_email_lower_uniq'
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # A failed CREATE UNIQUE INDEX CONCURRENTLY leaves an INVALID index behind,
+    # which IF NOT EXISTS would then keep; check first and drop any leftover.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT lower(email), count(*) FROM auth_user WHERE email <> '' "
+            "GROUP BY lower(email) HAVING count(*) > 1 ORDER BY lower(email)"
+        )
+        duplicates = cursor.fetchall()
+        if duplicates:
+            raise CommandError(
+                'Emails used by more than one user, ignoring case; change them before migrating: '
+                + ', '.join(f'{email} ({count} users)' for email, count in duplicates)
+            )
+        cursor.execute(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = %s AND NOT pg_index.indisvalid",
+            [INDEX_NAME]
+        )
+        if cursor.fetchone():
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('iam', '0002_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        # Signup probes lower(email); the index also closes the race between
+        # the probe and the INSERT. Blank emails (e.g. createsuperuser) are not unique.
+        migrations.RunSQL(
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} "
+            "ON auth_user (lower(email)) WHERE email <> ''",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}"
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.5 on 2026-10-18 13:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('iam', '0004_confirmationemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowerCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='follower_counter', serialize=False, to='auth.user')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(
+            '''
+            INSERT INTO iam_followercount (user_id, count)
+            SELECT followed_id, count(*) FROM iam_follow GROUP BY followed_id
+            ''',
+            migrations.RunSQL.noop
+        ),
+    ]
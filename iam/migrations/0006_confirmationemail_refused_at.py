@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iam', '0005_followercount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confirmationemail',
+            name='refused_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
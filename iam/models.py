@@ -0,0 +1,80 @@
+from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(
+        'auth.User',
+        related_name='following',
+        editable=False,
+        on_delete=models.CASCADE
+    )
+    followed = models.ForeignKey(
+        'auth.User',
+        related_name='followers',
+        editable=False,
+        on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='follow_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['followed', 'follower'], name='follow_followed_idx'),
+        ]
+
+
+class FollowerCount(models.Model):
+    """How many followers a user has, kept up to date as follows come and go.
+
+    Feeds read it to tell large accounts apart without counting follows.
+    """
+    user = models.OneToOneField(
+        'auth.User',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='follower_counter'
+    )
+    count = models.PositiveIntegerField(default=0)
+
+
+class RevokedToken(models.Model):
+    """Id of a revoked JWT, kept until the token expires on its own."""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+
+class ConfirmationEmail(models.Model):
+    """Confirmation email waiting to be sent with the next batch.
+
+    Emails the SMTP server refuses are kept with ``refused_at`` set and no
+    longer sent, so they do not hold back the emails buffered after them.
+    """
+    email = models.EmailField()
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    refused_at = models.DateTimeField(null=True, editable=False)
+
+
+@receiver(post_save, sender='auth.User')
+@receiver(post_delete, sender='auth.User')
+def evict_cached_user_row(sender, instance, **kwargs):
+    from iam.authentication import user_rows
+    user_rows.evict(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, created, instance, **kwargs):
+    if not created:
+        return
+    FollowerCount.objects.bulk_create([FollowerCount(user_id=instance.followed_id)], ignore_conflicts=True)
+    FollowerCount.objects.filter(user_id=instance.followed_id).update(count=F('count') + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    FollowerCount.objects.filter(user_id=instance.followed_id, count__gt=0).update(count=F('count') - 1)
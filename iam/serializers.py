@@ -1,11 +1,19 @@
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 from rest_framework import serializers
 
+from iam.emails import queue_confirmation_email
 from iam.exceptions import UsernameError, EmailError
-from iam.tasks import send_confirmation_email
+from thoughtsapi.instrumentation import TimedSerializerMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+EMAIL_UNIQUE_INDEX = 'auth_user_email_lower_uniq'
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     first_name = serializers.CharField(required=True, max_length=30)
     last_name = serializers.CharField(required=True, max_length=30)
     email = serializers.EmailField(required=True)
@@ -17,18 +25,40 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('first_name', 'last_name', 'email', 'username', 'password')
 
     def create(self, validated_data):
-        users = User.objects.filter(username=validated_data['username'])
-        if users:
-            username = validated_data['username']
+        username = validated_data['username']
+        email = validated_data['email']
+        taken = self.get_taken_field(username, email)
+        if taken == 'username':
             raise UsernameError(f'the user {username} is already in use')
-
-        users = User.objects.filter(email=validated_data['email'])
-        if users:
-            email = validated_data['email']
+        if taken == 'email':
             raise EmailError(f'the email {email} is already in use')
 
-        user = super(UserSerializer, self).create(validated_data)
-        user.set_password(validated_data['password'])
-        user.save()
-        send_confirmation_email.delay(user.email)
+        user = User(**validated_data)
+        user.password = make_password(validated_data['password'])
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+                queue_confirmation_email(user.email)
+        except IntegrityError as error:
+            # A concurrent signup took the username or email after the probe.
+            constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+            if constraint == EMAIL_UNIQUE_INDEX:
+                raise EmailError(f'the email {email} is already in use') from error
+            raise UsernameError(f'the user {username} is already in use') from error
         return user
+
+    def get_taken_field(self, username, email):
+        """Return 'username' or 'email' when one of them is in use, probing both in one query.
+
+        The email branch repeats the predicate of the partial unique index on
+        lower(email), otherwise Postgres can not use the index for it.
+        """
+        taken = User.objects.annotate(email_lower=Lower('email'))\
+                            .filter(Q(username=username) | (Q(email_lower=email.lower()) & ~Q(email='')))\
+                            .values_list('username', flat=True)[:2]
+        taken = list(taken)
+        if username in taken:
+            return 'username'
+        if taken:
+            return 'email'
+        return None
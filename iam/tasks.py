@@ -1,6 +1,38 @@
+import logging
+
+from django.utils import timezone
+
+from iam.models import RevokedToken
 from thoughtsapi.celery import app
 
 
-@app.task
+logger = logging.getLogger(__name__)
+
+
+@app.task(ignore_result=True)
 def send_confirmation_email(user_email):
-    print(f'SENT EMAIL TO {user_email}')
+    # Kept for messages enqueued before confirmation emails were batched.
+    from iam.emails import queue_confirmation_email
+    queue_confirmation_email(user_email)
+
+
+@app.task(
+    ignore_result=True,
+    acks_late=True,
+    autoretry_for=(OSError,),
+    retry_backoff=True,
+    max_retries=5
+)
+def send_confirmation_emails():
+    # SMTP and connection errors are OSErrors; they are retried with backoff.
+    from iam.emails import release_flush, send_pending_confirmation_emails
+    try:
+        sent = send_pending_confirmation_emails()
+    finally:
+        release_flush()
+    logger.info(f"EMAILS-TASK: Sent {sent} confirmation emails.")
+
+
+@app.task(ignore_result=True)
+def prune_revoked_tokens():
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
@@ -1,25 +1,41 @@
 import json
+from smtplib import SMTPServerDisconnected
 from typing import Union
+from unittest import mock
 
-from django.contrib.auth.hashers import is_password_usable
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from rest_framework import status
 
 from rest_framework.reverse import reverse
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from common.testing.builders import UserBuilder
+from common.testing.smtp import LocalSMTPServer
 from common.testing.testcase_mixins import AuthenticableTestMixin
+from iam import hashers
+from iam.authentication import ClaimsUser, StatelessJWTAuthentication, denylist, get_user_row, user_rows
+from iam.emails import FLUSH_SCHEDULED_KEY, release_flush, send_pending_confirmation_emails
+from iam.models import ConfirmationEmail, Follow, FollowerCount, RevokedToken
+from iam.serializers import UserSerializer
+from iam.tasks import send_confirmation_emails
 
 
 class TokenCaseMixin(TestCase):
 
     def assert_access_token(self, access_token):
         self.assertIsInstance(access_token, str)
-        self.assertEqual(len(access_token), 205)
+        self.assertEqual(len(access_token), 253)
         self.assertEqual(len(access_token.split('.')), 3)
 
+    def save_user(self, user: User):
+        # Tokens embed the user id, so their length depends on its digits.
+        user.pk = 1
+        user.save()
+
 
 class UserViewSetTest(AuthenticableTestMixin):
 
@@ -45,8 +61,7 @@ class UserViewSetTest(AuthenticableTestMixin):
         self.assertEqual(expected['lastName'], actual.last_name)
         self.assertEqual(expected['username'], actual.username)
         self.assertEqual(expected['email'], actual.email)
-        self.assertEqual(78, len(actual.password))
-        self.assertTrue(is_password_usable(actual.password))
+        self.assertTrue(check_password(expected['password'], actual.password))
 
     def test_should_register_new_user(self):
         user_data = UserBuilder().with_username('breno')\
@@ -105,6 +120,61 @@ class UserViewSetTest(AuthenticableTestMixin):
 
         self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
 
+    def test_should_register_new_user_and_queue_its_confirmation_email(self):
+        user_data = UserBuilder().with_username('breno')\
+                                 .with_password('123456')\
+                                 .with_first_name('Breno')\
+                                 .with_last_name('Magro')\
+                                 .with_email('breno@breno.com')\
+                                 .build(json=True)
+
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('user-list'), user_data, format='json')
+
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(['breno@breno.com'], list(ConfirmationEmail.objects.values_list('email', flat=True)))
+
+    def test_should_not_register_a_new_user_if_email_in_use_with_another_case(self):
+        UserBuilder().with_username('breno')\
+                     .with_password('123456')\
+                     .with_email('breno@breno.com')\
+                     .build()\
+                     .save()
+        user_data = UserBuilder().with_username('breno2')\
+                                 .with_password('123456')\
+                                 .with_first_name('Breno2')\
+                                 .with_last_name('Magro2')\
+                                 .with_email('BRENO@breno.com')\
+                                 .build(json=True)
+
+        response = self.client.post(reverse('user-list'), user_data, format='json')
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual('Email already in use', response.json()['message'])
+
+    def test_should_not_register_users_taken_concurrently(self):
+        UserBuilder().with_username('breno')\
+                     .with_password('123456')\
+                     .with_email('breno@breno.com')\
+                     .build()\
+                     .save()
+        url = reverse('user-list')
+        same_email = UserBuilder().with_username('breno2')\
+                                  .with_password('123456')\
+                                  .with_first_name('Breno2')\
+                                  .with_last_name('Magro2')\
+                                  .with_email('Breno@breno.com')\
+                                  .build(json=True)
+        same_username = dict(same_email, username='breno', email='breno2@breno.com')
+
+        with mock.patch.object(UserSerializer, 'get_taken_field', return_value=None):
+            email_response = self.client.post(url, same_email, format='json')
+            username_response = self.client.post(url, same_username, format='json')
+
+        self.assertEqual('Email already in use', email_response.json()['message'])
+        self.assertEqual('Username already in use', username_response.json()['message'])
+        self.assertEqual(1, User.objects.count())
+
     def test_should_get_user_info(self):
         user = UserBuilder().with_username('breno')\
                             .with_password('123456')\
@@ -149,11 +219,70 @@ class UserViewSetTest(AuthenticableTestMixin):
         self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
 
 
+class UserFollowTest(AuthenticableTestMixin):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breno')\
+                                .with_password('123456')\
+                                .with_email('breno@breno.com')\
+                                .build()
+        cls.user.save()
+        cls.other_user = UserBuilder().with_username('breno2')\
+                                      .with_password('123456')\
+                                      .with_email('breno2@breno.com')\
+                                      .build()
+        cls.other_user.save()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_should_follow_user(self):
+        self.authenticate_user(self.user, '123456')
+        url = reverse('user-follow', kwargs={'pk': self.other_user.id})
+
+        response = self.client.post(url)
+        self.client.post(url)
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        follow = Follow.objects.get()
+        self.assertEqual(self.user, follow.follower)
+        self.assertEqual(self.other_user, follow.followed)
+        self.assertEqual(1, FollowerCount.objects.get(user=self.other_user).count)
+
+    def test_should_unfollow_user(self):
+        Follow.objects.create(follower=self.user, followed=self.other_user)
+        self.authenticate_user(self.user, '123456')
+
+        response = self.client.delete(reverse('user-follow', kwargs={'pk': self.other_user.id}))
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(0, FollowerCount.objects.get(user=self.other_user).count)
+
+    def test_should_not_follow_itself(self):
+        self.authenticate_user(self.user, '123456')
+
+        response = self.client.post(reverse('user-follow', kwargs={'pk': self.user.id}))
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_should_not_follow_unknown_user(self):
+        self.authenticate_user(self.user, '123456')
+        response = self.client.post(reverse('user-follow', kwargs={'pk': 999999}))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_should_not_follow_when_not_authenticated(self):
+        response = self.client.post(reverse('user-follow', kwargs={'pk': self.other_user.id}))
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+
 class TokenCaseObtainPairViewTest(TokenCaseMixin):
 
     def assert_refresh_token(self, refresh_token):
         self.assertIsInstance(refresh_token, str)
-        self.assertEqual(len(refresh_token), 207)
+        self.assertEqual(len(refresh_token), 255)
         self.assertEqual(len(refresh_token.split('.')), 3)
 
     def test_should_obtain_pair_token(self):
@@ -163,7 +292,7 @@ class TokenCaseObtainPairViewTest(TokenCaseMixin):
                             .with_last_name('Magro')\
                             .with_email('breno@breno.com')\
                             .build()
-        user.save()
+        self.save_user(user)
 
         url = reverse('token_obtain_pair')
         credentials = {
@@ -183,7 +312,7 @@ class TokenCaseObtainPairViewTest(TokenCaseMixin):
                             .with_last_name('Magro')\
                             .with_email('breno@breno.com')\
                             .build()
-        user.save()
+        self.save_user(user)
 
         credentials = {
             'username': 'breno',
@@ -204,7 +333,7 @@ class TokenCaseRefreshViewTest(TokenCaseMixin):
                             .with_last_name('Magro')\
                             .with_email('breno@breno.com')\
                             .build()
-        user.save()
+        self.save_user(user)
         credentials = {
             'username': 'breno',
             'password': '123456'
@@ -219,8 +348,273 @@ class TokenCaseRefreshViewTest(TokenCaseMixin):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assert_access_token(response.data['access'])
 
+    def test_should_refresh_token_with_the_current_username(self):
+        user = UserBuilder().with_username('breno')\
+                            .with_password('123456')\
+                            .with_email('breno@breno.com')\
+                            .build()
+        self.save_user(user)
+        refresh = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'breno', 'password': '123456'}, format='json'
+        ).data['refresh']
+        user.username = 'brenoso'
+        user.save()
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('brenoso', AccessToken(response.data['access'])['username'])
+
+    def test_should_not_refresh_token_of_an_inactive_user(self):
+        user = UserBuilder().with_username('breno')\
+                            .with_password('123456')\
+                            .with_email('breno@breno.com')\
+                            .build()
+        self.save_user(user)
+        refresh = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'breno', 'password': '123456'}, format='json'
+        ).data['refresh']
+        user.is_active = False
+        user.save()
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_should_not_refresh_token_of_a_deleted_user(self):
+        user = UserBuilder().with_username('breno')\
+                            .with_password('123456')\
+                            .with_email('breno@breno.com')\
+                            .build()
+        self.save_user(user)
+        refresh = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'breno', 'password': '123456'}, format='json'
+        ).data['refresh']
+        user.delete()
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
     def test_should_not_refresh_when_token_is_invalid_or_expired(self):
         url = reverse('token_refresh')
         data = {'refresh': 'fadsfsdafsadfsadf'}
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StatelessJWTAuthenticationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breno')\
+                                .with_password('123456')\
+                                .with_email('breno@breno.com')\
+                                .build()
+        cls.user.save()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        denylist.clear()
+        user_rows.clear()
+        response = self.client.post(
+            reverse('token_obtain_pair'),
+            {'username': 'breno', 'password': '123456'},
+            format='json'
+        )
+        self.access = response.data['access']
+        self.refresh = response.data['refresh']
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_should_authenticate_from_token_claims_without_queries(self):
+        denylist.reload()
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(self.access)
+
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(self.user.id, user.id)
+        self.assertEqual('breno', user.username)
+        self.assertTrue(user.is_authenticated)
+
+    def test_should_load_user_of_tokens_without_claims(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+
+        user, _ = self.authenticate(access)
+
+        self.assertEqual(self.user, user)
+
+    def test_should_cache_user_rows(self):
+        user, _ = self.authenticate(self.access)
+        get_user_row(user)
+
+        with self.assertNumQueries(0):
+            row = get_user_row(user)
+
+        self.assertEqual(self.user, row)
+
+    def test_should_evict_cached_user_row_when_user_changes(self):
+        user, _ = self.authenticate(self.access)
+        get_user_row(user)
+
+        row = User.objects.get(pk=self.user.pk)
+        row.first_name = 'Brenoso'
+        row.save()
+
+        self.assertEqual('Brenoso', get_user_row(user).first_name)
+
+    def test_should_revoke_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+        response = self.client.post(reverse('token_revoke'), {'refresh': self.refresh}, format='json')
+
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertEqual(2, RevokedToken.objects.count())
+        response = self.client.post(reverse('token_revoke'), format='json')
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh}, format='json')
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_should_reject_tokens_revoked_by_another_process(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.client.post(reverse('token_revoke'), format='json')
+        denylist.clear()
+
+        response = self.client.post(reverse('token_revoke'), format='json')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+
+@override_settings(PASSWORD_HASHERS=['iam.hashers.PooledPBKDF2PasswordHasher'])
+class UserPasswordHashingTest(TestCase):
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_should_hash_passwords_compatible_with_pbkdf2(self):
+        pooled = make_password('123456')
+        plain = PBKDF2PasswordHasher().encode('123456', PBKDF2PasswordHasher().salt())
+
+        self.assertTrue(PBKDF2PasswordHasher().verify('123456', pooled))
+        self.assertTrue(check_password('123456', plain))
+        self.assertFalse(check_password('654321', pooled))
+
+    def test_should_answer_service_unavailable_when_hashing_pool_is_full(self):
+        UserBuilder().with_username('breno')\
+                     .with_password('123456')\
+                     .with_email('breno@breno.com')\
+                     .build()\
+                     .save()
+        busy_pool = hashers.PasswordHashingPool(size=1, backlog=0)
+        busy_pool._slots.acquire()
+
+        with mock.patch.object(hashers, 'pool', busy_pool):
+            response = self.client.post(
+                reverse('token_obtain_pair'),
+                {'username': 'breno', 'password': '123456'},
+                format='json'
+            )
+
+        self.assertEqual(status.HTTP_503_SERVICE_UNAVAILABLE, response.status_code)
+        self.assertEqual('1', response['Retry-After'])
+
+
+class UserConfirmationEmailTest(TestCase):
+
+    def send_through(self, smtp: LocalSMTPServer, batch_size: int) -> int:
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=smtp.port,
+            EMAIL_BATCH_SIZE=batch_size
+        ):
+            return send_pending_confirmation_emails()
+
+    def test_should_send_buffered_emails_in_batches_over_one_connection(self):
+        ConfirmationEmail.objects.bulk_create(
+            [ConfirmationEmail(email=f'user{index}@thoughts.com') for index in range(5)]
+        )
+
+        with LocalSMTPServer() as smtp:
+            sent = self.send_through(smtp, batch_size=2)
+
+        self.assertEqual(5, sent)
+        self.assertEqual(1, smtp.connections)
+        self.assertEqual(5, len(smtp.messages))
+        self.assertIn('To: user0@thoughts.com', smtp.messages[0])
+        self.assertFalse(ConfirmationEmail.objects.exists())
+
+    def test_should_set_refused_emails_aside_and_send_the_others(self):
+        ConfirmationEmail.objects.bulk_create(
+            [ConfirmationEmail(email=f'user{index}@thoughts.com') for index in range(3)]
+        )
+
+        with LocalSMTPServer(refused=['user0@thoughts.com']) as smtp:
+            sent = self.send_through(smtp, batch_size=2)
+
+        self.assertEqual(2, sent)
+        self.assertEqual(2, len(smtp.messages))
+        refused = ConfirmationEmail.objects.get()
+        self.assertEqual('user0@thoughts.com', refused.email)
+        self.assertIsNotNone(refused.refused_at)
+
+    def test_should_keep_only_unsent_emails_when_sending_fails(self):
+        ConfirmationEmail.objects.bulk_create(
+            [ConfirmationEmail(email=f'user{index}@thoughts.com') for index in range(3)]
+        )
+        sent_messages = []
+
+        def send_messages(messages):
+            if len(sent_messages) == 1:
+                raise SMTPServerDisconnected('Connection unexpectedly closed')
+            sent_messages.extend(messages)
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            with self.assertRaises(SMTPServerDisconnected):
+                send_pending_confirmation_emails()
+
+        self.assertEqual(
+            ['user1@thoughts.com', 'user2@thoughts.com'],
+            list(ConfirmationEmail.objects.order_by('id').values_list('email', flat=True))
+        )
+
+    def test_should_release_the_flush_when_sending_fails(self):
+        cache.set(FLUSH_SCHEDULED_KEY, 1)
+
+        with mock.patch('iam.emails.send_pending_confirmation_emails', side_effect=SMTPServerDisconnected()),\
+                mock.patch('iam.tasks.send_confirmation_emails.retry', side_effect=SMTPServerDisconnected()),\
+                mock.patch('iam.tasks.send_confirmation_emails.apply_async'):
+            with self.assertRaises(SMTPServerDisconnected):
+                send_confirmation_emails()
+
+        self.assertIsNone(cache.get(FLUSH_SCHEDULED_KEY))
+
+    def test_should_schedule_a_flush_for_emails_buffered_during_the_last_one(self):
+        cache.set(FLUSH_SCHEDULED_KEY, 1)
+        ConfirmationEmail.objects.create(email='late@thoughts.com')
+
+        with mock.patch('iam.tasks.send_confirmation_emails.apply_async') as apply_async:
+            release_flush()
+
+        apply_async.assert_called_once()
+        self.assertTrue(cache.get(FLUSH_SCHEDULED_KEY))
+
+    def test_should_let_the_next_signup_schedule_a_flush_when_none_is_buffered(self):
+        cache.set(FLUSH_SCHEDULED_KEY, 1)
+
+        with mock.patch('iam.tasks.send_confirmation_emails.apply_async') as apply_async:
+            release_flush()
+
+        apply_async.assert_not_called()
+        self.assertIsNone(cache.get(FLUSH_SCHEDULED_KEY))
+
+    def test_should_not_connect_when_no_email_is_buffered(self):
+        with LocalSMTPServer() as smtp:
+            sent = self.send_through(smtp, batch_size=2)
+
+        self.assertEqual(0, sent)
+        self.assertEqual(0, smtp.connections)
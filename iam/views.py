@@ -1,9 +1,18 @@
 from django.contrib.auth.models import User
 from django.http import JsonResponse
 from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt import views as jwt_views
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from iam.authentication import ClaimsTokenObtainPairSerializer, DenylistTokenRefreshSerializer, denylist
 
 from iam.exceptions import UsernameError, EmailError
+from iam.models import Follow
 from iam.serializers import UserSerializer
 
 
@@ -43,3 +52,42 @@ class UserDetailViewSet(mixins.RetrieveModelMixin,
             }
             return JsonResponse(data, status=status.HTTP_403_FORBIDDEN)
         return super(UserDetailViewSet, self).retrieve(request, *args, **kwargs)
+
+    @action(detail=True, methods=['post', 'delete'])
+    def follow(self, request, pk=None):
+        followed = self.get_object()
+        if followed.id == request.user.id:
+            data = {
+                'error': 'Bad Request (400)',
+                'message': 'Users can not follow themselves'
+            }
+            return JsonResponse(data, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'DELETE':
+            Follow.objects.filter(follower_id=request.user.id, followed=followed).delete()
+        else:
+            Follow.objects.get_or_create(follower_id=request.user.id, followed=followed)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    serializer_class = DenylistTokenRefreshSerializer
+
+
+class TokenRevokeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        refresh = None
+        if 'refresh' in request.data:
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError as error:
+                raise InvalidToken(error.args[0])
+        denylist.revoke(request.auth)
+        if refresh is not None:
+            denylist.revoke(refresh)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from thoughtsapi.db.routers import pinned_to_primary
+from thoughtsapi.instrumentation import record_cache_lookup
+
+
+class CacheStats:
+    """Per-process hit/miss counters, keyed by cache namespace."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def hit(self, namespace: str):
+        with self._lock:
+            self._counters[f'{namespace}.hits'] += 1
+        record_cache_lookup(hit=True)
+
+    def miss(self, namespace: str):
+        with self._lock:
+            self._counters[f'{namespace}.misses'] += 1
+        record_cache_lookup(hit=False)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+stats = CacheStats()
+
+
+def _in_thread(func: Callable) -> Callable[..., Awaitable[Any]]:
+    return sync_to_async(func, thread_sensitive=False)
+
+
+def get_or_compute(namespace: str, key: str, compute: Callable[[], Any], timeout: int) -> Any:
+    """Return the cached value of ``key`` or compute and cache it.
+
+    Only one caller computes a missing key at a time (single flight): the
+    others wait up to CACHE_LOCK_WAIT seconds for the value to show up before
+    computing it themselves. Values are computed from the primary database:
+    a lagging replica would keep stale rows cached for the whole timeout.
+    """
+    value = cache.get(key)
+    if value is not None:
+        stats.hit(namespace)
+        return value
+    stats.miss(namespace)
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        with pinned_to_primary():
+            return compute()
+
+    try:
+        with pinned_to_primary():
+            value = compute()
+        cache.set(key, value, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+async def aget_or_compute(namespace: str, key: str, compute: Callable[[], Awaitable[Any]], timeout: int) -> Any:
+    """Coroutine flavour of ``get_or_compute`` for async views.
+
+    Cache calls run on the thread pool, off the thread-sensitive executor
+    that serializes database access, so hits never queue behind queries.
+    """
+    value = await _in_thread(cache.get)(key)
+    if value is not None:
+        stats.hit(namespace)
+        return value
+    stats.miss(namespace)
+
+    lock_key = f'{key}:lock'
+    if not await _in_thread(cache.add)(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+            value = await _in_thread(cache.get)(key)
+            if value is not None:
+                return value
+        with pinned_to_primary():
+            return await compute()
+
+    try:
+        with pinned_to_primary():
+            value = await compute()
+        await _in_thread(cache.set)(key, value, timeout)
+    finally:
+        await _in_thread(cache.delete)(lock_key)
+    return value
+
+
+def _timeline_version_key(username: str) -> str:
+    return f'timeline:{username}:version'
+
+
+def get_timeline_version(username: str) -> int:
+    key = _timeline_version_key(username)
+    version = cache.get(key)
+    if version is None:
+        # Seeding with the clock keeps versions moving forward when the key
+        # expires or is evicted, so pages cached under an older version never
+        # come back; the key can therefore expire like the pages do.
+        version = time.time_ns()
+        if not cache.add(key, version, settings.TIMELINE_CACHE_TIMEOUT):
+            version = cache.get(key) or version
+    return version
+
+
+def invalidate_timeline(username: str):
+    try:
+        cache.incr(_timeline_version_key(username))
+    except ValueError:
+        cache.add(_timeline_version_key(username), time.time_ns(), settings.TIMELINE_CACHE_TIMEOUT)
+
+
+def _timeline_page_key(username: str, version: int, page: tuple) -> str:
+    digest = hashlib.md5(repr(page).encode()).hexdigest()
+    return f'timeline:{username}:{version}:{digest}'
+
+
+def get_timeline_page(username: str, page: tuple, compute: Callable[[], dict]) -> dict:
+    """Cached timeline page of ``username``; ``page`` holds whatever the page content depends on."""
+    key = _timeline_page_key(username, get_timeline_version(username), page)
+    return get_or_compute('timeline', key, compute, settings.TIMELINE_CACHE_TIMEOUT)
+
+
+async def aget_timeline_page(username: str, page: tuple, compute: Callable[[], Awaitable[dict]]) -> dict:
+    key = _timeline_page_key(username, await _in_thread(get_timeline_version)(username), page)
+    return await aget_or_compute('timeline', key, compute, settings.TIMELINE_CACHE_TIMEOUT)
+
+
+def _thought_key(pk: int) -> str:
+    return f'thought:{pk}'
+
+
+def get_thought_entry(pk: int, compute: Callable[[], Optional[dict]]) -> Optional[dict]:
+    return get_or_compute('thought', _thought_key(pk), compute, settings.THOUGHT_CACHE_TIMEOUT)
+
+
+async def aget_thought_entry(pk: int, compute: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+    return await aget_or_compute('thought', _thought_key(pk), compute, settings.THOUGHT_CACHE_TIMEOUT)
+
+
+def invalidate_thoughts(pks: Iterable[int]):
+    cache.delete_many([_thought_key(pk) for pk in pks])
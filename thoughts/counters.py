@@ -0,0 +1,56 @@
+from django.db import connection
+
+from thoughts.models import Hashtag, HashtagThought, Thought, UserThoughtCount
+
+
+def get_user_thought_count(username: str) -> int:
+    count = UserThoughtCount.objects.filter(user__username=username).values_list('count', flat=True).first()
+    return count or 0
+
+
+def reconcile_user_thought_counts() -> int:
+    """Set every user's thought count to the live count; return how many were wrong.
+
+    An increment committed while the live counts are read may be overwritten,
+    so a count can stay off by the thoughts published meanwhile until the
+    next run.
+    """
+    counters = UserThoughtCount._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {counters} (user_id, count)
+            SELECT owner_id, count(*) FROM {Thought._meta.db_table} GROUP BY owner_id
+            ON CONFLICT (user_id) DO UPDATE SET count = EXCLUDED.count
+            WHERE {counters}.count <> EXCLUDED.count
+            '''
+        )
+        corrected = cursor.rowcount
+        cursor.execute(
+            f'''
+            UPDATE {counters} SET count = 0
+            WHERE count <> 0 AND NOT EXISTS (
+                SELECT 1 FROM {Thought._meta.db_table} WHERE owner_id = {counters}.user_id
+            )
+            '''
+        )
+        return corrected + cursor.rowcount
+
+
+def reconcile_hashtag_thought_counts() -> int:
+    """Set every hashtag's thought count to the live count; return how many were wrong."""
+    hashtags = Hashtag._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            UPDATE {hashtags} SET thought_count = live.count
+            FROM (
+                SELECT hashtag.id, count(link.id) AS count
+                FROM {hashtags} AS hashtag
+                LEFT JOIN {HashtagThought._meta.db_table} AS link ON link.hashtag_id = hashtag.id
+                GROUP BY hashtag.id
+            ) AS live
+            WHERE {hashtags}.id = live.id AND {hashtags}.thought_count <> live.count
+            '''
+        )
+        return cursor.rowcount
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from typing import Iterable, List, Set
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from iam.models import Follow, FollowerCount
+from thoughts.models import FeedEntry, Thought
+from thoughts.serializers import ThoughtRowSerializer
+
+
+def get_large_account_ids(user_ids: Iterable[int]) -> Set[int]:
+    """Those of ``user_ids`` followed by too many readers to fan their thoughts out on write."""
+    return set(
+        FollowerCount.objects.filter(user_id__in=user_ids, count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS)
+                             .values_list('user_id', flat=True)
+    )
+
+
+def fan_out(thoughts: List[Thought]) -> int:
+    """Write ``thoughts`` into the feeds of their owners' followers."""
+    large_account_ids = get_large_account_ids({thought.owner_id for thought in thoughts})
+    thoughts_by_owner = defaultdict(list)
+    for thought in thoughts:
+        if thought.owner_id not in large_account_ids:
+            thoughts_by_owner[thought.owner_id].append(thought)
+
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    written = 0
+    for owner_id, owner_thoughts in thoughts_by_owner.items():
+        follower_ids = Follow.objects.filter(followed_id=owner_id)\
+                                     .values_list('follower_id', flat=True)\
+                                     .iterator(chunk_size=batch_size)
+        entries = []
+        for follower_id in follower_ids:
+            entries.extend(
+                FeedEntry(reader_id=follower_id, thought_id=thought.id, thought_created_at=thought.created_at)
+                for thought in owner_thoughts
+            )
+            if len(entries) >= batch_size:
+                FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+                written += len(entries)
+                entries = []
+        FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        written += len(entries)
+    return written
+
+
+def backfill_feed(reader_id: int, followed_id: int):
+    """Copy the latest thoughts of a newly followed account into the reader's feed."""
+    if get_large_account_ids([followed_id]):
+        return
+    thoughts = Thought.objects.filter(owner_id=followed_id)\
+                              .order_by('-created_at', '-id')\
+                              .values_list('id', 'created_at')[:settings.FEED_MAX_ENTRIES]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(reader_id=reader_id, thought_id=thought_id, thought_created_at=created_at)
+            for thought_id, created_at in thoughts
+        ],
+        ignore_conflicts=True
+    )
+
+
+def trim_feeds() -> int:
+    """Delete the entries of every feed past its FEED_MAX_ENTRIES newest ones.
+
+    Readers are trimmed FEED_TRIM_BATCH_SIZE at a time, one short transaction
+    per batch. Each reader's cutoff is found by walking
+    ``feed_entry_reader_recent_idx`` past its newest entries, so readers with
+    short feeds cost an index probe and the table is never ranked as a whole.
+    """
+    entries = FeedEntry._meta.db_table
+    deleted = 0
+    last_reader_id = 0
+    while True:
+        reader_ids = list(
+            User.objects.filter(id__gt=last_reader_id)
+                        .order_by('id')
+                        .values_list('id', flat=True)[:settings.FEED_TRIM_BATCH_SIZE]
+        )
+        if not reader_ids:
+            return deleted
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                DELETE FROM {entries} AS entry
+                USING (
+                    SELECT reader.id AS reader_id, cutoff.thought_created_at, cutoff.thought_id
+                    FROM unnest(%s::integer[]) AS reader (id)
+                    CROSS JOIN LATERAL (
+                        SELECT thought_created_at, thought_id FROM {entries}
+                        WHERE reader_id = reader.id
+                        ORDER BY thought_created_at DESC, thought_id DESC
+                        OFFSET %s LIMIT 1
+                    ) AS cutoff
+                ) AS trimmed
+                WHERE entry.reader_id = trimmed.reader_id
+                  AND (entry.thought_created_at, entry.thought_id) <= (trimmed.thought_created_at, trimmed.thought_id)
+                ''',
+                [reader_ids, settings.FEED_MAX_ENTRIES]
+            )
+            deleted += cursor.rowcount
+        last_reader_id = reader_ids[-1]
+
+
+def get_home_feed_sources(reader_id: int) -> list:
+    """Querysets whose merge, newest first, is the home feed of ``reader_id``.
+
+    Materialized entries come from the reader's feed; the reader's own
+    thoughts and those of the large accounts they follow are read from the
+    owners' timelines, one index range per account.
+    """
+    pulled_ids = [reader_id]
+    pulled_ids.extend(
+        Follow.objects.filter(
+            follower_id=reader_id,
+            followed__follower_counter__count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('followed_id', flat=True)
+    )
+    entries = FeedEntry.objects.filter(reader_id=reader_id).values(
+        'thought_id',
+        'thought_created_at',
+        'thought__thought',
+        'thought__owner_id',
+        'thought__owner__username'
+    )
+    sources = [(entries, ('thought_created_at', 'thought_id'))]
+    for owner_id in pulled_ids:
+        thoughts = Thought.objects.filter(owner_id=owner_id).values(*ThoughtRowSerializer.values_fields)
+        sources.append((thoughts, ('created_at', 'id')))
+    return sources
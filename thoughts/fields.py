@@ -0,0 +1,41 @@
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+
+
+URL_PLACEHOLDER = 987654321
+
+
+def build_url_template(view_name, request, format=None, lookup_url_kwarg='pk'):
+    """Reverse ``view_name`` once and split it around the lookup value.
+
+    ``prefix + str(pk) + suffix`` gives the same URL as a full ``reverse()``
+    for integer lookups, without resolving the pattern again.
+    """
+    url = reverse(view_name, kwargs={lookup_url_kwarg: URL_PLACEHOLDER}, request=request, format=format)
+    prefix, _, suffix = url.rpartition(str(URL_PLACEHOLDER))
+    return prefix, suffix
+
+
+class CachedHyperlinkedIdentityField(serializers.HyperlinkedIdentityField):
+    """HyperlinkedIdentityField that reverses the URL once per serializer.
+
+    With ``many=True`` the child serializer, and so this field, is shared by
+    every item of the page.
+    """
+
+    def __init__(self, view_name=None, **kwargs):
+        super(CachedHyperlinkedIdentityField, self).__init__(view_name, **kwargs)
+        self._url_templates = {}
+
+    def get_url(self, obj, view_name, request, format):
+        if hasattr(obj, 'pk') and obj.pk in (None, ''):
+            return None
+        lookup_value = getattr(obj, self.lookup_field)
+        if not isinstance(lookup_value, int):
+            return super(CachedHyperlinkedIdentityField, self).get_url(obj, view_name, request, format)
+
+        key = (view_name, format)
+        if key not in self._url_templates:
+            self._url_templates[key] = build_url_template(view_name, request, format, self.lookup_url_kwarg)
+        prefix, suffix = self._url_templates[key]
+        return f'{prefix}{lookup_value}{suffix}'
@@ -1,9 +1,30 @@
 import re
-from typing import List
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, List, Optional
 
-from django.utils.datastructures import OrderedSet
+from django.conf import settings
 
 
-def unique_hashtags(text: str) -> List[str]:
-    hashtags = re.findall('#(\w+)', text)
-    return list(OrderedSet(hashtags))
+HASHTAG_RE = re.compile(r'#(\w+)')
+
+
+@lru_cache(maxsize=4096)
+def normalize_hashtag(hashtag: str) -> str:
+    if hashtag.isascii():
+        return hashtag.lower()
+    return unicodedata.normalize('NFKC', hashtag).casefold()
+
+
+def unique_hashtags(text: str, max_hashtags: Optional[int] = None) -> List[str]:
+    if max_hashtags is None:
+        max_hashtags = settings.HASHTAGS_MAX_PER_THOUGHT
+    # dict.fromkeys keeps the first occurrence order while discarding repeated
+    # hashtags, so each distinct spelling is only normalized once.
+    hashtags = dict.fromkeys(map(normalize_hashtag, dict.fromkeys(HASHTAG_RE.findall(text))))
+    return list(hashtags)[:max_hashtags]
+
+
+def unique_hashtags_many(texts: Iterable[str]) -> List[List[str]]:
+    max_hashtags = settings.HASHTAGS_MAX_PER_THOUGHT
+    return [unique_hashtags(text, max_hashtags) for text in texts]
@@ -0,0 +1,58 @@
+from typing import List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from thoughts.models import Thought, UnindexedThought, register_hashtags
+
+
+INDEXING_SCHEDULED_KEY = 'hashtags:indexing-scheduled'
+
+
+def queue_hashtag_indexing(thought_ids: List[int]):
+    """Buffer thoughts for hashtag indexing; the first ones of an interval schedule the drain."""
+    UnindexedThought.objects.bulk_create([UnindexedThought(thought_id=thought_id) for thought_id in thought_ids])
+    transaction.on_commit(schedule_indexing)
+
+
+def schedule_indexing():
+    from thoughts.tasks import index_pending_hashtags
+    if cache.add(INDEXING_SCHEDULED_KEY, 1, settings.HASHTAG_INDEXING_INTERVAL):
+        index_pending_hashtags.apply_async(countdown=settings.HASHTAG_INDEXING_INTERVAL)
+
+
+def release_indexing():
+    """Let the next thought schedule a drain, scheduling one now if thoughts are still buffered."""
+    cache.delete(INDEXING_SCHEDULED_KEY)
+    if UnindexedThought.objects.exists():
+        schedule_indexing()
+
+
+def index_buffered_thoughts() -> int:
+    """Index the hashtags of every buffered thought, HASHTAG_INDEXING_BATCH_SIZE at a time.
+
+    Each batch gathers the thoughts of every request since the last drain
+    and is indexed with a single ``register_hashtags``. Rows are locked with
+    SKIP LOCKED, so concurrent drains split the buffer.
+    """
+    indexed = 0
+    while True:
+        with transaction.atomic():
+            thought_ids = list(
+                UnindexedThought.objects.select_for_update(skip_locked=True)
+                                        .order_by('thought_id')
+                                        .values_list('thought_id', flat=True)[:settings.HASHTAG_INDEXING_BATCH_SIZE]
+            )
+            if not thought_ids:
+                break
+            # Thoughts already linked were indexed by a drain that failed to
+            # clear the buffer; only the others are registered.
+            thoughts = list(
+                Thought.objects.filter(id__in=thought_ids, hashtag=None)
+                               .only('id', 'owner_id', 'thought', 'created_at')
+            )
+            register_hashtags(thoughts)
+            UnindexedThought.objects.filter(thought_id__in=thought_ids).delete()
+        indexed += len(thought_ids)
+    return indexed
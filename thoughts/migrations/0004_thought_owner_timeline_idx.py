@@ -0,0 +1,19 @@
+# Generated by Django 3.1.5 on 2026-10-18 11:48
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('thoughts', '0003_hashtag'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='thought',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='thought_owner_timeline_idx'),
+        ),
+    ]
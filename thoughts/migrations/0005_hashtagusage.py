@@ -0,0 +1,32 @@
+# Generated by Django 3.1.5 on 2026-10-18 11:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thoughts', '0004_thought_owner_timeline_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashtagUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField()),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='thoughts.hashtag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hashtagusage',
+            index=models.Index(fields=['resolution', 'bucket', 'hashtag', 'count'], name='hashtag_usage_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hashtagusage',
+            constraint=models.UniqueConstraint(fields=('hashtag', 'resolution', 'bucket'), name='hashtag_usage_bucket_uniq'),
+        ),
+    ]
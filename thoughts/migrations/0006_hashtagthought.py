@@ -0,0 +1,69 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def backfill_thought_created_at(apps, schema_editor):
+    HashtagThought = apps.get_model('thoughts', 'HashtagThought')
+    Thought = apps.get_model('thoughts', 'Thought')
+    created_at = Thought.objects.filter(id=OuterRef('thought_id')).values('created_at')[:1]
+    last_id = 0
+    while True:
+        ids = list(
+            HashtagThought.objects.filter(id__gt=last_id, thought_created_at__isnull=True)
+                                  .order_by('id')
+                                  .values_list('id', flat=True)[:BACKFILL_CHUNK_SIZE]
+        )
+        if not ids:
+            break
+        # One short transaction per chunk, so rows are only locked briefly.
+        with transaction.atomic():
+            HashtagThought.objects.filter(id__in=ids).update(thought_created_at=Subquery(created_at))
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('thoughts', '0005_hashtagusage'),
+    ]
+
+    operations = [
+        # Adopt the table Django created for Hashtag.thoughts as an explicit model.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='HashtagThought',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='thoughts.hashtag')),
+                        ('thought', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='thoughts.thought')),
+                    ],
+                    options={
+                        'db_table': 'thoughts_hashtag_thoughts',
+                        'unique_together': {('hashtag', 'thought')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='hashtag',
+                    name='thoughts',
+                    field=models.ManyToManyField(through='thoughts.HashtagThought', to='thoughts.Thought'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='hashtagthought',
+            name='thought_created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_thought_created_at, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='hashtagthought',
+            index=models.Index(fields=['hashtag', '-thought_created_at', '-thought'], name='hashtag_thought_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+import unicodedata
+
+from django.db import migrations, transaction
+from django.db.models import F
+
+
+def normalize_hashtag(hashtag):
+    # Frozen copy of thoughts.hashtags.normalize_hashtag as of this migration,
+    # so later changes to normalization do not change what it does.
+    if hashtag.isascii():
+        return hashtag.lower()
+    return unicodedata.normalize('NFKC', hashtag).casefold()
+
+
+def merge_hashtag(apps, duplicate_id, hashtag_id):
+    HashtagThought = apps.get_model('thoughts', 'HashtagThought')
+    HashtagUsage = apps.get_model('thoughts', 'HashtagUsage')
+    linked = HashtagThought.objects.filter(hashtag_id=hashtag_id).values('thought_id')
+    HashtagThought.objects.filter(hashtag_id=duplicate_id)\
+                          .exclude(thought_id__in=linked)\
+                          .update(hashtag_id=hashtag_id)
+    for usage in HashtagUsage.objects.filter(hashtag_id=duplicate_id):
+        merged = HashtagUsage.objects.filter(
+            hashtag_id=hashtag_id, resolution=usage.resolution, bucket=usage.bucket
+        ).update(count=F('count') + usage.count)
+        if merged:
+            usage.delete()
+        else:
+            usage.hashtag_id = hashtag_id
+            usage.save(update_fields=['hashtag'])
+    # Remaining links pointed to thoughts already linked to the kept hashtag.
+    apps.get_model('thoughts', 'Hashtag').objects.filter(id=duplicate_id).delete()
+
+
+def normalize_hashtags(apps, schema_editor):
+    Hashtag = apps.get_model('thoughts', 'Hashtag')
+    # Hashtags made only of lowercase ASCII word characters are already normalized.
+    candidates = Hashtag.objects.filter(hashtag__regex=r'[^a-z0-9_]')\
+                                .order_by('id')\
+                                .values_list('id', 'hashtag')
+    for hashtag_id, hashtag in candidates.iterator():
+        normalized = normalize_hashtag(hashtag)
+        if normalized == hashtag:
+            continue
+        with transaction.atomic():
+            existing_id = Hashtag.objects.filter(hashtag=normalized).values_list('id', flat=True).first()
+            if existing_id is None:
+                Hashtag.objects.filter(id=hashtag_id).update(hashtag=normalized)
+            else:
+                merge_hashtag(apps, hashtag_id, existing_id)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('thoughts', '0006_hashtagthought'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_hashtags, migrations.RunPython.noop),
+    ]
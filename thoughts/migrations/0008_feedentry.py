@@ -0,0 +1,47 @@
+# Generated by Django 3.1.5 on 2026-10-18 12:02
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('thoughts', '0007_normalize_hashtags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thought_created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='reader',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='thought',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='thoughts.thought'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['reader', '-thought_created_at', '-thought'], name='feed_entry_reader_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('reader', 'thought'), name='feed_entry_uniq'),
+        ),
+        AddIndexConcurrently(
+            model_name='thought',
+            index=models.Index(fields=['-created_at', '-id'], name='thought_recent_idx'),
+        ),
+    ]
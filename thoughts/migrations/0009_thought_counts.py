@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('thoughts', '0008_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserThoughtCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='thought_count', serialize=False, to='auth.user')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='hashtag',
+            name='thought_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            '''
+            INSERT INTO thoughts_userthoughtcount (user_id, count)
+            SELECT owner_id, count(*) FROM thoughts_thought GROUP BY owner_id
+            ''',
+            migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            '''
+            UPDATE thoughts_hashtag SET thought_count = live.count
+            FROM (
+                SELECT hashtag_id, count(*) AS count FROM thoughts_hashtag_thoughts GROUP BY hashtag_id
+            ) AS live
+            WHERE thoughts_hashtag.id = live.hashtag_id
+            ''',
+            migrations.RunSQL.noop
+        ),
+    ]
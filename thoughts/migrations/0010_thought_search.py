@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Full-text search over thoughts.
+
+    ``search_vector`` is generated by Postgres from ``thought``, so it is
+    not declared on the model and every insert keeps it in sync. Adding the
+    column rewrites the table; the index is then built without locking writes.
+    """
+    atomic = False
+
+    dependencies = [
+        ('thoughts', '0009_thought_counts'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            '''
+            ALTER TABLE thoughts_thought ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', thought)) STORED
+            ''',
+            'ALTER TABLE thoughts_thought DROP COLUMN search_vector'
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY thought_search_idx ON thoughts_thought USING gin (search_vector)',
+            'DROP INDEX CONCURRENTLY thought_search_idx'
+        ),
+    ]
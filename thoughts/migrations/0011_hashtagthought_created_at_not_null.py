@@ -0,0 +1,72 @@
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def backfill_thought_created_at(apps, schema_editor):
+    # Links written by processes still running the code from before 0006.
+    HashtagThought = apps.get_model('thoughts', 'HashtagThought')
+    Thought = apps.get_model('thoughts', 'Thought')
+    created_at = Thought.objects.filter(id=OuterRef('thought_id')).values('created_at')[:1]
+    while True:
+        ids = list(
+            HashtagThought.objects.filter(thought_created_at__isnull=True)
+                                  .order_by('id')
+                                  .values_list('id', flat=True)[:BACKFILL_CHUNK_SIZE]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            HashtagThought.objects.filter(id__in=ids).update(thought_created_at=Subquery(created_at))
+
+
+class Migration(migrations.Migration):
+    """Make ``thought_created_at`` NOT NULL without scanning the table under an exclusive lock.
+
+    The NOT VALID check is validated under a lock that lets writes through;
+    SET NOT NULL then trusts it (PostgreSQL 12+) instead of scanning.
+    """
+    atomic = False
+
+    dependencies = [
+        ('thoughts', '0010_thought_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_thought_created_at, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    '''
+                    ALTER TABLE thoughts_hashtag_thoughts ADD CONSTRAINT thought_created_at_not_null
+                    CHECK (thought_created_at IS NOT NULL) NOT VALID
+                    ''',
+                    'ALTER TABLE thoughts_hashtag_thoughts DROP CONSTRAINT thought_created_at_not_null'
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE thoughts_hashtag_thoughts VALIDATE CONSTRAINT thought_created_at_not_null',
+                    migrations.RunSQL.noop
+                ),
+                migrations.RunSQL(
+                    '''
+                    ALTER TABLE thoughts_hashtag_thoughts ALTER COLUMN thought_created_at SET NOT NULL;
+                    ALTER TABLE thoughts_hashtag_thoughts DROP CONSTRAINT thought_created_at_not_null
+                    ''',
+                    '''
+                    ALTER TABLE thoughts_hashtag_thoughts ADD CONSTRAINT thought_created_at_not_null
+                    CHECK (thought_created_at IS NOT NULL) NOT VALID;
+                    ALTER TABLE thoughts_hashtag_thoughts ALTER COLUMN thought_created_at DROP NOT NULL
+                    '''
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='hashtagthought',
+                    name='thought_created_at',
+                    field=models.DateTimeField(),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.5 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thoughts', '0011_hashtagthought_created_at_not_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnindexedThought',
+            fields=[
+                ('thought', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='thoughts.thought')),
+            ],
+        ),
+    ]
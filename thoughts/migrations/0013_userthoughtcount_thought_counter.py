@@ -0,0 +1,27 @@
+# Generated by Django 3.1.5 on 2026-10-18 13:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('thoughts', '0012_unindexedthought'),
+    ]
+
+    operations = [
+        # related_name lives in Python only; altering the column would just
+        # drop and revalidate the foreign key.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='userthoughtcount',
+                    name='user',
+                    field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='thought_counter', serialize=False, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
@@ -1,9 +1,18 @@
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
-from django.db.models.signals import post_save
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import reduce
+from operator import or_
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from thoughts.hashtags import unique_hashtags
+from thoughts.cache import invalidate_thoughts, invalidate_timeline
+from thoughts.hashtags import unique_hashtags_many
 
 
 class Thought(models.Model):
@@ -15,6 +24,14 @@ class Thought(models.Model):
     thought = models.TextField(max_length=800, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='thought_owner_timeline_idx'),
+            models.Index(fields=['-created_at', '-id'], name='thought_recent_idx'),
+        ]
+        # Migration 0010 adds the generated ``search_vector`` column and its
+        # GIN index, thought_search_idx; Django cannot declare either.
+
     def __str__(self):
         return self.thought
 
@@ -28,20 +45,279 @@ class Hashtag(models.Model):
     )
     hashtag = models.TextField(max_length=100, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
-    thoughts = models.ManyToManyField(Thought)
+    thoughts = models.ManyToManyField(Thought, through='HashtagThought')
+    # Thoughts linked to the hashtag, incremented as they are indexed;
+    # thoughts.tasks.reconcile_thought_counts corrects any drift.
+    thought_count = models.PositiveIntegerField(default=0, editable=False)
+
+
+class UserThoughtCount(models.Model):
+    """How many thoughts a user has published, incremented as they are inserted.
+
+    ``auth.User`` cannot take the column, so the counter has its own table.
+    Deleted thoughts are not subtracted; thoughts.tasks.reconcile_thought_counts
+    corrects that and any other drift.
+    """
+    user = models.OneToOneField(
+        'auth.User',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='thought_counter'
+    )
+    count = models.PositiveIntegerField(default=0)
+
+
+class HashtagThought(models.Model):
+    """Hashtag to thought link, ordered by the thought's recency.
+
+    ``thought_created_at`` copies ``Thought.created_at`` so a tag page is a
+    range scan on ``hashtag_thought_recent_idx``, without sorting.
+    """
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE)
+    thought = models.ForeignKey(Thought, on_delete=models.CASCADE)
+    thought_created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'thoughts_hashtag_thoughts'
+        unique_together = [('hashtag', 'thought')]
+        indexes = [
+            models.Index(
+                fields=['hashtag', '-thought_created_at', '-thought'],
+                name='hashtag_thought_recent_idx'
+            ),
+        ]
+
+
+class UnindexedThought(models.Model):
+    """Thought whose hashtags wait to be indexed with the next batch (HASHTAG_INDEXING=async)."""
+    thought = models.OneToOneField(Thought, primary_key=True, on_delete=models.CASCADE)
+
+
+class FeedEntry(models.Model):
+    """A thought materialized in the home feed of one of its owner's followers.
+
+    Feeds are written when thoughts are published (fan-out on write) and
+    trimmed to FEED_MAX_ENTRIES per reader, so a feed page is a range scan on
+    ``feed_entry_reader_recent_idx`` however many accounts the reader follows.
+    Thoughts of accounts with FEED_FANOUT_MAX_FOLLOWERS followers or more are
+    not materialized; they are read from the owners' timelines instead.
+    """
+    reader = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    thought = models.ForeignKey(Thought, on_delete=models.CASCADE)
+    thought_created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['reader', 'thought'], name='feed_entry_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['reader', '-thought_created_at', '-thought'], name='feed_entry_reader_recent_idx'),
+        ]
+
+
+class HashtagUsage(models.Model):
+    """How many thoughts used a hashtag within a time bucket.
+
+    Buckets are ``resolution`` seconds wide; each window in TRENDING_WINDOWS
+    is summed over the buckets of its own resolution.
+    """
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE)
+    resolution = models.PositiveIntegerField()
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hashtag', 'resolution', 'bucket'],
+                name='hashtag_usage_bucket_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket', 'hashtag', 'count'], name='hashtag_usage_window_idx'),
+        ]
+
+
+def floor_bucket(moment: datetime, resolution: int) -> datetime:
+    return datetime.fromtimestamp(moment.timestamp() // resolution * resolution, tz=moment.tzinfo)
+
+
+def add_to_counters(queryset: models.QuerySet, key: str, field: str, increments: Dict[int, int]):
+    """Add ``increments`` (``key`` value -> amount) to ``field`` of the rows of ``queryset``.
+
+    The rows are locked first, all at once and ordered by ``key``, so
+    concurrent transactions take the locks in the same order and cannot
+    deadlock; rows sharing an amount are then updated by a single query.
+    """
+    if not increments:
+        return
+    keys_by_increment = defaultdict(list)
+    for key_value, increment in increments.items():
+        keys_by_increment[increment].append(key_value)
+    with transaction.atomic(savepoint=False):
+        list(
+            queryset.select_for_update()
+                    .filter(**{f'{key}__in': sorted(increments)})
+                    .order_by(key, 'pk')
+                    .values_list('pk', flat=True)
+        )
+        for increment, key_values in keys_by_increment.items():
+            queryset.filter(**{f'{key}__in': key_values}).update(**{field: F(field) + increment})
+
+
+def count_hashtag_usage(usages: Dict[int, int]):
+    """Add ``usages`` (hashtag id -> uses) to the current bucket of every resolution."""
+    if not usages:
+        return
+    now = timezone.now()
+    buckets = {
+        resolution: floor_bucket(now, resolution)
+        for resolution in {resolution for _, resolution in settings.TRENDING_WINDOWS.values()}
+    }
+    HashtagUsage.objects.bulk_create(
+        [
+            HashtagUsage(hashtag_id=hashtag_id, resolution=resolution, bucket=bucket)
+            for hashtag_id in usages
+            for resolution, bucket in buckets.items()
+        ],
+        ignore_conflicts=True
+    )
+    in_buckets = reduce(or_, [Q(resolution=resolution, bucket=bucket) for resolution, bucket in buckets.items()])
+    add_to_counters(HashtagUsage.objects.filter(in_buckets), 'hashtag_id', 'count', usages)
+
+
+def count_hashtag_thoughts(usages: Dict[int, int]):
+    """Add ``usages`` (hashtag id -> newly linked thoughts) to the hashtags' thought counts."""
+    add_to_counters(Hashtag.objects.all(), 'id', 'thought_count', usages)
+
+
+def count_user_thoughts(thoughts: List[Thought]):
+    """Add ``thoughts`` to the thought counts of their owners."""
+    counts = Counter(thought.owner_id for thought in thoughts)
+    UserThoughtCount.objects.bulk_create(
+        [UserThoughtCount(user_id=owner_id) for owner_id in counts],
+        ignore_conflicts=True
+    )
+    add_to_counters(UserThoughtCount.objects.all(), 'user_id', 'count', counts)
+
+
+def register_hashtags(thoughts: List[Thought]):
+    """Link the hashtags found in ``thoughts`` using a constant number of queries.
+
+    Missing hashtags are inserted with ``ignore_conflicts`` and then read back,
+    so a concurrent transaction creating the same hashtag makes the insert a
+    no-op instead of failing on the unique constraint. ``thoughts`` must not
+    be indexed yet, otherwise their uses are counted twice.
+    """
+    thought_hashtags = list(zip(thoughts, unique_hashtags_many(thought.thought for thought in thoughts)))
+    creators = {}
+    for thought, hashtags in thought_hashtags:
+        for hashtag in hashtags:
+            creators.setdefault(hashtag, thought.owner_id)
+    if not creators:
+        return
+
+    hashtag_ids = dict(
+        Hashtag.objects.filter(hashtag__in=creators).values_list('hashtag', 'id')
+    )
+    missing = [hashtag for hashtag in creators if hashtag not in hashtag_ids]
+    if missing:
+        Hashtag.objects.bulk_create(
+            [Hashtag(hashtag=hashtag, creator_id=creators[hashtag]) for hashtag in missing],
+            ignore_conflicts=True
+        )
+        hashtag_ids.update(
+            Hashtag.objects.filter(hashtag__in=missing).values_list('hashtag', 'id')
+        )
+
+    links = [
+        HashtagThought(
+            hashtag_id=hashtag_ids[hashtag],
+            thought_id=thought.id,
+            thought_created_at=thought.created_at
+        )
+        for thought, hashtags in thought_hashtags
+        for hashtag in hashtags
+    ]
+    HashtagThought.objects.bulk_create(links, ignore_conflicts=True)
+    usages = Counter(link.hashtag_id for link in links)
+    count_hashtag_usage(usages)
+    count_hashtag_thoughts(usages)
+
+
+def thoughts_created(thoughts: List[Thought]):
+    """Count freshly inserted ``thoughts``, index their hashtags, fan them
+    out to their owners' followers and evict their owners' timelines.
+
+    ``post_save`` calls it for a single thought; ``bulk_create`` sends no
+    signals, so bulk inserts must call it themselves.
+    """
+    from thoughts.indexing import queue_hashtag_indexing
+    from thoughts.tasks import fan_out_thoughts
+    thought_ids = [thought.id for thought in thoughts]
+    count_user_thoughts(thoughts)
+    if settings.HASHTAG_INDEXING == 'async':
+        queue_hashtag_indexing(thought_ids)
+    else:
+        register_hashtags(thoughts)
+    transaction.on_commit(lambda: fan_out_thoughts.delay(thought_ids))
+
+    usernames = {thought.owner.username for thought in thoughts}
+
+    def invalidate_timelines():
+        for username in usernames:
+            invalidate_timeline(username)
+
+    # Bumping again on commit evicts pages a concurrent reader may have cached
+    # from the database before these thoughts became visible.
+    invalidate_timelines()
+    transaction.on_commit(invalidate_timelines)
 
 
 @receiver(post_save, sender=Thought)
-def register_thought_hashtags(sender, created, instance, **kwargs):
+def thought_created(sender, created, instance, **kwargs):
     if created:
-        hashtags = unique_hashtags(instance.thought)
-        for hashtag in hashtags:
-            try:
-                hashtag_model = Hashtag.objects.get(hashtag=hashtag)
-            except ObjectDoesNotExist:
-                hashtag_model = Hashtag(hashtag=hashtag, creator=instance.owner)
-                hashtag_model.save()
-
-            hashtag_model.thoughts.add(instance)
-            hashtag_model.save()
-    print('Houston, we have a problem')
+        thoughts_created([instance])
+
+
+@receiver(post_save, sender=Thought)
+@receiver(post_delete, sender=Thought)
+def invalidate_thought_detail(sender, instance, **kwargs):
+    invalidate_thoughts([instance.pk])
+    transaction.on_commit(lambda: invalidate_thoughts([instance.pk]))
+
+
+@receiver(pre_save, sender='auth.User')
+def remember_stored_username(sender, instance, update_fields=None, **kwargs):
+    instance._stored_username = None
+    if instance._state.adding or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._stored_username = sender._default_manager.filter(pk=instance.pk)\
+                                                       .values_list('username', flat=True)\
+                                                       .first()
+
+
+@receiver(post_save, sender='auth.User')
+def invalidate_owner_thoughts_detail(sender, created, instance, **kwargs):
+    # Cached thoughts embed the owner's username; a prolific owner has too
+    # many of them to evict inside the request.
+    stored_username = getattr(instance, '_stored_username', None)
+    if created or stored_username is None or stored_username == instance.username:
+        return
+    from thoughts.tasks import invalidate_owner_thoughts
+    owner_id = instance.pk
+    transaction.on_commit(lambda: invalidate_owner_thoughts.delay(owner_id))
+
+
+@receiver(post_save, sender='iam.Follow')
+def schedule_feed_backfill(sender, created, instance, **kwargs):
+    if not created:
+        return
+    from thoughts.tasks import backfill_follower_feed
+    reader_id, followed_id = instance.follower_id, instance.followed_id
+    transaction.on_commit(lambda: backfill_follower_feed.delay(reader_id, followed_id))
+
+
+@receiver(post_delete, sender='iam.Follow')
+def remove_unfollowed_thoughts(sender, instance, **kwargs):
+    FeedEntry.objects.filter(reader_id=instance.follower_id, thought__owner_id=instance.followed_id).delete()
@@ -0,0 +1,203 @@
+import heapq
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from operator import itemgetter
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+Cursor = namedtuple('Cursor', ['position', 'page_number'])
+
+
+class TimelineCursorPagination(BasePagination):
+    """Keyset pagination over ``cursor_fields``, newest first.
+
+    The cursor carries the position of the last row of the page, so the next
+    page is a range scan on an index ordered like ``cursor_fields`` instead of
+    an OFFSET, and rows inserted meanwhile never shift the following pages.
+    No COUNT is run. ``?limit=`` shrinks the page, up to ``max_page_size``.
+    Cursors are signed, so their position and page number can be trusted.
+    """
+    cursor_query_param = 'cursor'
+    cursor_salt = 'thoughts.pagination.cursor'
+    cursor_fields = ('created_at', 'id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        queryset = queryset.order_by(*[f'-{field}' for field in self.cursor_fields])
+        if cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(cursor.position))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_cursor = None
+        if self.has_next:
+            page_number = 1 if cursor is None else cursor.page_number
+            self.next_cursor = Cursor(self.get_position(page[-1]), page_number + 1)
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_page_number(self, request):
+        cursor = self.decode_cursor(request)
+        return 1 if cursor is None else cursor.page_number
+
+    def get_keyset_filter(self, position, cursor_fields=None):
+        first_field, second_field = cursor_fields or self.cursor_fields
+        first_value, second_value = position
+        # The redundant `lte` gives the planner an index range to scan; the OR
+        # alone would not be used as an index condition.
+        return Q(**{f'{first_field}__lte': first_value}) & (
+            Q(**{f'{first_field}__lt': first_value}) |
+            Q(**{f'{second_field}__lt': second_value})
+        )
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return tuple(item[field] for field in self.cursor_fields)
+        return tuple(getattr(item, field) for field in self.cursor_fields)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = signing.loads(encoded, salt=self.cursor_salt)
+            position = tuple(
+                parse_datetime(value) if isinstance(value, str) else value
+                for value in payload['p']
+            )
+            page_number = int(payload['n'])
+        except (signing.BadSignature, TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.cursor_fields) or None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(position, page_number)
+
+    def encode_cursor(self, cursor):
+        payload = {
+            'p': [value.isoformat() if isinstance(value, datetime) else value for value in cursor.position],
+            'n': cursor.page_number
+        }
+        return signing.dumps(payload, salt=self.cursor_salt)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_cursor))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
+
+
+class CounterLimitOffsetPagination(LimitOffsetPagination):
+    """Offset pagination whose ``count`` is read from a maintained counter.
+
+    ``get_counter`` returns the count, so no COUNT(*) runs over the
+    queryset. Pages are sliced whatever the counter says, so a counter that
+    drifted low still serves the rows.
+    """
+
+    def __init__(self, get_counter):
+        self.get_counter = get_counter
+
+    def get_count(self, queryset):
+        return self.get_counter()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = self.get_count(queryset)
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        return list(queryset[self.offset:self.offset + self.limit])
+
+
+class HashtagCursorPagination(TimelineCursorPagination):
+    cursor_fields = ('thought_created_at', 'thought_id')
+
+
+class SearchCursorPagination(TimelineCursorPagination):
+    """Keyset pagination over search results, best ranked first."""
+    cursor_fields = ('rank', 'id')
+
+
+class FeedCursorPagination(TimelineCursorPagination):
+    """Keyset pagination over the merge of several sources, newest first.
+
+    Sources are ``(queryset, cursor_fields)`` pairs of ``.values()`` rows.
+    Each source is read with its own keyset filter and the pages are merged
+    by position, so the cursor stays valid across sources; a row found in
+    more than one source is kept once.
+    """
+
+    def paginate_sources(self, sources, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        streams = []
+        for queryset, cursor_fields in sources:
+            queryset = queryset.order_by(*[f'-{field}' for field in cursor_fields])
+            if cursor is not None:
+                queryset = queryset.filter(self.get_keyset_filter(cursor.position, cursor_fields))
+            streams.append([
+                (tuple(row[field] for field in cursor_fields), row)
+                for row in queryset[:self.page_size + 1]
+            ])
+
+        page = []
+        for position, row in heapq.merge(*streams, key=itemgetter(0), reverse=True):
+            if page and page[-1][0] == position:
+                continue
+            page.append((position, row))
+            if len(page) > self.page_size:
+                break
+
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_cursor = None
+        if self.has_next:
+            page_number = 1 if cursor is None else cursor.page_number
+            self.next_cursor = Cursor(page[-1][0], page_number + 1)
+        return [row for _, row in page]
@@ -0,0 +1,15 @@
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+
+
+class CamelCaseFastPathJSONRenderer(CamelCaseJSONRenderer):
+    """CamelCaseJSONRenderer that trusts responses flagged as ``camelized``.
+
+    Views that already build camelCased data set ``response.camelized = True``
+    and their payload is dumped without walking it again.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if getattr(response, 'camelized', False):
+            return super(CamelCaseJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        return super(CamelCaseFastPathJSONRenderer, self).render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db.models import Expression, FloatField
+from django.db.models.functions import Cast
+
+from thoughts.models import Thought
+
+
+SEARCH_CONFIG = 'simple'
+
+
+class SearchVectorColumn(Expression):
+    """The ``search_vector`` column of thoughts, under the alias its query gives the table.
+
+    Postgres generates the column (see migration 0010) and indexes it with
+    thought_search_idx; Django 3.1 cannot declare generated columns.
+    """
+
+    def __init__(self, alias=None):
+        super(SearchVectorColumn, self).__init__(output_field=SearchVectorField())
+        self.alias = alias
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        clone = self.copy()
+        clone.alias = query.get_initial_alias()
+        return clone
+
+    def relabeled_clone(self, change_map):
+        clone = self.copy()
+        clone.alias = change_map.get(self.alias, self.alias)
+        return clone
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.search_vector', []
+
+
+def search_thoughts(text: str):
+    """Thoughts matching every word of ``text``, annotated with their ``rank``.
+
+    Only the newest SEARCH_MAX_MATCHES matches are ranked and returned, so
+    paging stops after them: a common word matches millions of thoughts, and
+    ranking them all would read every one.
+    Those are found by the GIN index for rare words and by walking
+    ``thought_recent_idx`` for common ones. The rank is a double so a cursor
+    compares it exactly.
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='plain')
+    newest_matches = Thought.objects.annotate(search=SearchVectorColumn())\
+                                    .filter(search=query)\
+                                    .order_by('-created_at', '-id')\
+                                    .values('id')[:settings.SEARCH_MAX_MATCHES]
+    return Thought.objects.filter(id__in=newest_matches)\
+                          .annotate(rank=Cast(SearchRank(SearchVectorColumn(), query), FloatField()))
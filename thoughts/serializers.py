@@ -1,27 +1,91 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
-from thoughts.models import Thought
+from iam.authentication import get_user_row
+from thoughts.fields import CachedHyperlinkedIdentityField, build_url_template
+from thoughts.models import Thought, thoughts_created
+from thoughtsapi.instrumentation import TimedListSerializer, TimedSerializerMixin
 
 
 class UserSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField('user-detail')
+    url = CachedHyperlinkedIdentityField('user-detail')
 
     class Meta:
         model = User
         fields = ('username', 'url')
 
 
-class ThoughtSerializer(serializers.HyperlinkedModelSerializer):
+class ThoughtListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+
+    def create(self, validated_data):
+        owner = get_user_row(self.context['request'].user)
+        thoughts = Thought.objects.bulk_create(Thought(owner=owner, **item) for item in validated_data)
+        thoughts_created(thoughts)
+        return thoughts
+
+
+class ThoughtSerializer(TimedSerializerMixin, serializers.HyperlinkedModelSerializer):
     thought = serializers.CharField(max_length=800)
     created_at = serializers.DateTimeField(read_only=True)
     user = UserSerializer(source='owner', read_only=True)
-    url = serializers.HyperlinkedIdentityField('thought-detail')
+    url = CachedHyperlinkedIdentityField('thought-detail')
 
     class Meta:
         fields = ['thought', 'created_at', 'user', 'url']
         model = Thought
+        list_serializer_class = ThoughtListSerializer
 
     def create(self, validated_data):
-        validated_data['owner'] = self.context['request'].user
+        validated_data['owner'] = get_user_row(self.context['request'].user)
         return super(ThoughtSerializer, self).create(validated_data)
+
+
+class ThoughtRowSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """Read-only twin of ThoughtSerializer for ``.values(*values_fields)`` rows.
+
+    It skips the model serializer field machinery and emits camelCased keys
+    directly, so responses built with it can skip the renderer's camelize
+    pass. The output must stay identical to ThoughtSerializer's.
+    """
+    values_fields = ('id', 'thought', 'created_at', 'owner_id', 'owner__username')
+    created_at_field = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super(ThoughtRowSerializer, self).__init__(*args, **kwargs)
+        self._url_templates = None
+
+    def get_url_templates(self):
+        if self._url_templates is None:
+            request = self.context['request']
+            format = self.context.get('format')
+            self._url_templates = (
+                build_url_template('thought-detail', request, format),
+                build_url_template('user-detail', request, format)
+            )
+        return self._url_templates
+
+    def to_representation(self, row):
+        (thought_prefix, thought_suffix), (user_prefix, user_suffix) = self.get_url_templates()
+        return {
+            'thought': row['thought'],
+            'createdAt': self.created_at_field.to_representation(row['created_at']),
+            'user': {
+                'username': row['owner__username'],
+                'url': f"{user_prefix}{row['owner_id']}{user_suffix}"
+            },
+            'url': f"{thought_prefix}{row['id']}{thought_suffix}"
+        }
+
+
+def link_to_row(link: dict) -> dict:
+    """Map a ``.values()`` row of a model linking to a thought to ThoughtRowSerializer's keys."""
+    return {
+        'id': link['thought_id'],
+        'thought': link['thought__thought'],
+        'created_at': link['thought_created_at'],
+        'owner_id': link['thought__owner_id'],
+        'owner__username': link['thought__owner__username']
+    }
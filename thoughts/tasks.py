@@ -0,0 +1,104 @@
+import logging
+from datetime import timedelta
+from itertools import islice
+from typing import List
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from thoughts import counters, feeds
+from thoughts.cache import invalidate_thoughts
+from thoughts.models import HashtagUsage, Thought
+from thoughtsapi.celery import app
+
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(
+    ignore_result=True,
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=5
+)
+def index_pending_hashtags():
+    from thoughts.indexing import index_buffered_thoughts, release_indexing
+    indexed = index_buffered_thoughts()
+    release_indexing()
+    logger.info(f"HASHTAGS-TASK: Indexed hashtags of {indexed} buffered thoughts.")
+
+
+@app.task(ignore_result=True)
+def prune_hashtag_usage():
+    now = timezone.now()
+    retention = {}
+    for length, resolution in settings.TRENDING_WINDOWS.values():
+        retention[resolution] = max(retention.get(resolution, 0), length + resolution)
+    for resolution, seconds in retention.items():
+        deleted, _ = HashtagUsage.objects.filter(
+            resolution=resolution,
+            bucket__lt=now - timedelta(seconds=seconds)
+        ).delete()
+        logger.info(f"HASHTAGS-TASK: Pruned {deleted} usage buckets of {resolution}s.")
+
+
+@app.task(ignore_result=True)
+def refresh_trending_hashtags():
+    from thoughts.trending import cache_trending_hashtags
+    cache_trending_hashtags()
+    logger.info(f"HASHTAGS-TASK: Refreshed trending hashtags of {len(settings.TRENDING_WINDOWS)} windows.")
+
+
+@app.task(ignore_result=True)
+def invalidate_owner_thoughts(owner_id: int):
+    batch_size = settings.THOUGHT_CACHE_EVICTION_BATCH_SIZE
+    thought_ids = Thought.objects.filter(owner_id=owner_id).values_list('id', flat=True).iterator(batch_size)
+    evicted = 0
+    while True:
+        batch = list(islice(thought_ids, batch_size))
+        if not batch:
+            break
+        invalidate_thoughts(batch)
+        evicted += len(batch)
+    logger.info(f"CACHE-TASK: Evicted {evicted} cached thoughts of owner {owner_id}.")
+
+
+@app.task(ignore_result=True)
+def reconcile_thought_counts():
+    users = counters.reconcile_user_thought_counts()
+    hashtags = counters.reconcile_hashtag_thought_counts()
+    logger.info(f"COUNTERS-TASK: Reconciled thought counts of {users} users and {hashtags} hashtags.")
+
+
+@app.task(
+    ignore_result=True,
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=5
+)
+def fan_out_thoughts(thought_ids: List[int]):
+    # Entries are inserted ignoring conflicts, so a retried delivery only adds what is missing.
+    thoughts = list(Thought.objects.filter(id__in=thought_ids).only('id', 'owner_id', 'created_at'))
+    written = feeds.fan_out(thoughts)
+    logger.info(f"FEEDS-TASK: Fanned out {len(thoughts)} thoughts into {written} feed entries.")
+
+
+@app.task(
+    ignore_result=True,
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=5
+)
+def backfill_follower_feed(reader_id: int, followed_id: int):
+    feeds.backfill_feed(reader_id, followed_id)
+    logger.info(f"FEEDS-TASK: Backfilled feed of {reader_id} with thoughts of {followed_id}.")
+
+
+@app.task(ignore_result=True)
+def trim_home_feeds():
+    deleted = feeds.trim_feeds()
+    logger.info(f"FEEDS-TASK: Trimmed {deleted} feed entries.")
@@ -1,15 +1,41 @@
+import json
+import time
+from base64 import urlsafe_b64encode
+from collections import OrderedDict
+from datetime import timedelta
 from typing import Union
+from unittest import mock
 
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
 from rest_framework import status
+from rest_framework.request import Request
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
 from common.testing.builders import UserBuilder
 from common.testing.testcase_mixins import AuthenticableTestMixin
-from thoughts.hashtags import unique_hashtags
-from thoughts.models import Thought, Hashtag
+from iam.models import Follow
+from thoughts.hashtags import unique_hashtags, unique_hashtags_many
+from thoughts import cache as thoughts_cache
+from thoughts.indexing import INDEXING_SCHEDULED_KEY, release_indexing
+from thoughts.models import (
+    FeedEntry, Thought, Hashtag, HashtagUsage, UnindexedThought, UserThoughtCount, register_hashtags
+)
+from thoughts.serializers import ThoughtSerializer
+from thoughts.views import ThoughtDetailView, ThoughtListView
+from thoughts.tasks import (
+    backfill_follower_feed, fan_out_thoughts, index_pending_hashtags, prune_hashtag_usage,
+    reconcile_thought_counts, refresh_trending_hashtags, trim_home_feeds
+)
 
 
 class ThoughtBuilder:
@@ -51,10 +77,165 @@ class ThoughtTest(TestCase):
         self.assertEqual('Lorem ipsum Trenison', str(thought), )
 
 
+class RegisterHashtagsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+
+    def test_should_register_new_hashtags_with_constant_queries(self):
+        text = ' '.join(f'#tag{number}' for number in range(20))
+        thought = ThoughtBuilder().with_thought(text)\
+                                  .with_owner(self.user)\
+                                  .build()
+
+        with self.assertNumQueries(13):
+            thought.save()
+
+        self.assertEqual(20, Hashtag.objects.filter(thoughts=thought).count())
+        self.assertEqual(20, Hashtag.objects.filter(creator=self.user).count())
+
+    def test_should_link_existing_hashtags_without_creating_them(self):
+        Hashtag.objects.bulk_create(Hashtag(hashtag=f'tag{number}') for number in range(20))
+        text = ' '.join(f'#tag{number}' for number in range(20))
+        thought = ThoughtBuilder().with_thought(text)\
+                                  .with_owner(self.user)\
+                                  .build()
+
+        with self.assertNumQueries(11):
+            thought.save()
+
+        self.assertEqual(20, Hashtag.objects.count())
+        self.assertEqual(20, Hashtag.objects.filter(thoughts=thought).count())
+        self.assertFalse(Hashtag.objects.filter(creator=self.user).exists())
+
+    def test_should_register_hashtags_shared_by_many_thoughts(self):
+        thoughts = [
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build()
+            for text in ('#Lorem #Ipsum', '#Ipsum #Dolor')
+        ]
+        Thought.objects.bulk_create(thoughts)
+        thoughts = list(Thought.objects.order_by('id'))
+
+        with self.assertNumQueries(11):
+            register_hashtags(thoughts)
+
+        self.assertEqual(3, Hashtag.objects.count())
+        self.assertEqual(2, Hashtag.objects.get(hashtag='ipsum').thoughts.count())
+        self.assertEqual(1, Hashtag.objects.get(hashtag='dolor').thoughts.count())
+
+
+@override_settings(HASHTAG_INDEXING='async')
+class IndexThoughtsHashtagsTaskTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+
+    def test_should_not_index_hashtags_while_saving_thought(self):
+        thought = ThoughtBuilder().with_thought('#Lorem #Ipsum')\
+                                  .with_owner(self.user)\
+                                  .build()
+        thought.save()
+
+        self.assertFalse(Hashtag.objects.exists())
+
+    def test_should_index_thoughts_of_separate_requests_in_one_batch(self):
+        for text in ('#Lorem #Ipsum', '#Ipsum', 'no hashtags'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+        self.assertEqual(3, UnindexedThought.objects.count())
+
+        with mock.patch('thoughts.indexing.register_hashtags', wraps=register_hashtags) as register:
+            index_pending_hashtags.delay()
+
+        register.assert_called_once()
+        self.assertEqual(3, len(register.call_args[0][0]))
+        self.assertEqual(2, Hashtag.objects.get(hashtag='ipsum').thoughts.count())
+        self.assertFalse(UnindexedThought.objects.exists())
+
+    def test_should_drain_buffered_thoughts_in_batches(self):
+        for text in ('#Lorem', '#Ipsum', '#Dolor'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+        with override_settings(HASHTAG_INDEXING_BATCH_SIZE=2), \
+                mock.patch('thoughts.indexing.register_hashtags', wraps=register_hashtags) as register:
+            index_pending_hashtags.delay()
+
+        self.assertEqual(2, register.call_count)
+        self.assertEqual(3, Hashtag.objects.count())
+
+    def test_should_schedule_a_drain_for_thoughts_buffered_during_the_last_one(self):
+        cache.set(INDEXING_SCHEDULED_KEY, 1)
+        ThoughtBuilder().with_thought('#Lorem').with_owner(self.user).build().save()
+
+        with mock.patch('thoughts.tasks.index_pending_hashtags.apply_async') as apply_async:
+            release_indexing()
+
+        apply_async.assert_called_once()
+
+
+class CacheTest(TestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_should_compute_missing_value_once_and_cache_it(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'value': len(calls)}
+
+        first = thoughts_cache.get_or_compute('test', 'test:key', compute, 60)
+        second = thoughts_cache.get_or_compute('test', 'test:key', compute, 60)
+
+        self.assertEqual({'value': 1}, first)
+        self.assertEqual({'value': 1}, second)
+        self.assertEqual(1, len(calls))
+
+    @override_settings(CACHE_LOCK_WAIT=0.05)
+    def test_should_compute_without_caching_when_another_caller_holds_the_lock(self):
+        cache.add('test:key:lock', 1)
+
+        value = thoughts_cache.get_or_compute('test', 'test:key', lambda: 'computed', 60)
+
+        self.assertEqual('computed', value)
+        self.assertIsNone(cache.get('test:key'))
+
+    def test_should_move_timeline_version_forward_on_invalidation(self):
+        version = thoughts_cache.get_timeline_version('breninho')
+
+        thoughts_cache.invalidate_timeline('breninho')
+
+        self.assertGreater(thoughts_cache.get_timeline_version('breninho'), version)
+
+    def test_should_expire_timeline_versions(self):
+        with mock.patch.object(thoughts_cache.cache, 'add', wraps=cache.add) as add:
+            thoughts_cache.get_timeline_version('breninho')
+
+        add.assert_called_once_with('timeline:breninho:version', mock.ANY, settings.TIMELINE_CACHE_TIMEOUT)
+
+    def test_should_move_timeline_version_forward_after_it_expired(self):
+        version = thoughts_cache.get_timeline_version('breninho')
+
+        cache.delete('timeline:breninho:version')
+
+        self.assertGreater(thoughts_cache.get_timeline_version('breninho'), version)
+
+
 class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
 
     def setUp(self) -> None:
         self.client = APIClient()
+        cache.clear()
         super(ThoughtViewSetTest, self).setUp()
 
     def test_should_publish_a_thought(self):
@@ -117,7 +298,7 @@ class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
 
         hashtags = Hashtag.objects.filter(thoughts=thought)
         self.assertEqual(len(hashtags), 2)
-        self.assertEqual(hashtags[0].hashtag, 'FelisArcu')
+        self.assertEqual(hashtags[0].hashtag, 'felisarcu')
         self.assertEqual(hashtags[0].creator, thought.owner)
         self.assertEqual(hashtags[0].thoughts.all()[0], thought)
         self.assertEqual(hashtags[1].hashtag, 'atluctus')
@@ -132,7 +313,7 @@ class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
                             .with_password('123456') \
                             .build()
         user.save()
-        hashtag = Hashtag(hashtag='FelisArcu', creator=user)
+        hashtag = Hashtag(hashtag='felisarcu', creator=user)
         hashtag.save()
         self.authenticate_user(user, '123456')
         data = {'thought': '''Lorem ipsum dolor sit. #FelisArcu #atluctus.'''}
@@ -157,7 +338,7 @@ class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
 
         hashtags = Hashtag.objects.filter(thoughts=thought)
         self.assertEqual(len(hashtags), 2)
-        self.assertEqual(hashtags[0].hashtag, 'FelisArcu')
+        self.assertEqual(hashtags[0].hashtag, 'felisarcu')
         self.assertEqual(hashtags[0].creator, thought.owner)
         self.assertEqual(hashtags[0].thoughts.all()[0], thought)
         self.assertEqual(hashtags[1].hashtag, 'atluctus')
@@ -181,6 +362,21 @@ class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
         self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
         self.assertEqual(0, Thought.objects.count())
 
+    def test_should_not_publish_a_thought_of_a_deleted_user(self):
+        user = UserBuilder().with_username('breninho') \
+                            .with_email('brenoninho@breno.com') \
+                            .with_password('123456') \
+                            .build()
+        user.save()
+        self.authenticate_user(user, '123456')
+        User.objects.filter(pk=user.pk).delete()
+
+        response = self.client.post(reverse('thought-list'), {'thought': 'Lorem ipsum'}, format='json')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+        self.assertEqual('user_not_found', response.data['code'])
+        self.assertEqual(0, Thought.objects.count())
+
     def test_should_list_user_thoughts(self):
         first_user = UserBuilder().with_first_name('Bren') \
                                   .with_last_name('Magro') \
@@ -220,19 +416,219 @@ class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
         self.assertEqual(len(response.data['results']), 2)
         self.assert_response_thought(
             {
-                'thought': 'Lorem ipsum dolor sit.',
+                'thought': 'consectetur adipiscing.',
                 'user': {'username': second_user.username}
             },
             response.data['results'][0]
         )
         self.assert_response_thought(
             {
-                'thought': 'consectetur adipiscing.',
+                'thought': 'Lorem ipsum dolor sit.',
                 'user': {'username': second_user.username}
             },
             response.data['results'][1]
         )
 
+    def test_should_page_user_thoughts_by_cursor(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(f'Thought {number}').with_owner(user).build()
+            for number in range(150)
+        )
+        expected_ids = list(
+            Thought.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+        first_page = self.client.get(reverse('thought-list'), {'username': user.username})
+        ThoughtBuilder().with_thought('Newer thought').with_owner(user).build().save()
+        second_page = self.client.get(first_page.data['next'])
+
+        self.assertEqual(status.HTTP_200_OK, first_page.status_code)
+        self.assertNotIn('count', first_page.data)
+        self.assertEqual(100, len(first_page.data['results']))
+        self.assertEqual(status.HTTP_200_OK, second_page.status_code)
+        self.assertEqual(50, len(second_page.data['results']))
+        self.assertIsNone(second_page.data['next'])
+        listed_ids = [
+            int(result['url'].rstrip('/').rsplit('/', 1)[1])
+            for result in first_page.data['results'] + second_page.data['results']
+        ]
+        self.assertEqual(expected_ids, listed_ids)
+
+    def test_should_page_user_thoughts_by_cursor_with_a_capped_limit(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(f'Thought {number}').with_owner(user).build()
+            for number in range(150)
+        )
+
+        first_page = self.client.get(reverse('thought-list'), {'username': user.username, 'limit': 10})
+        second_page = self.client.get(first_page.data['next'])
+        capped_page = self.client.get(reverse('thought-list'), {'username': user.username, 'limit': 1000})
+
+        self.assertEqual(10, len(first_page.data['results']))
+        self.assertEqual(10, len(second_page.data['results']))
+        self.assertNotEqual(first_page.data['results'][0], second_page.data['results'][0])
+        self.assertEqual(100, len(capped_page.data['results']))
+
+    def test_should_list_user_thoughts_with_a_single_query(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(f'Thought {number}').with_owner(user).build()
+            for number in range(20)
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('thought-list'), {'username': user.username})
+
+        self.assertEqual(20, len(response.data['results']))
+        thought = Thought.objects.order_by('-created_at', '-id').first()
+        first_result = response.data['results'][0]
+        self.assertEqual(
+            reverse('thought-detail', kwargs={'pk': thought.id}, request=response.wsgi_request),
+            first_result['url']
+        )
+        self.assertEqual(
+            reverse('user-detail', kwargs={'pk': user.id}, request=response.wsgi_request),
+            first_result['user']['url']
+        )
+
+    def test_should_list_user_thoughts_as_the_model_serializer_renders_them(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        for text in ('Ação "entre aspas" #Lorem', 'Lorem ipsum\ndolor', 'consectetur 🤔'):
+            ThoughtBuilder().with_thought(text).with_owner(user).build().save()
+
+        for suffix in ('', '.json'):
+            response = self.client.get(
+                reverse('thought-list') + suffix,
+                {'username': user.username}
+            )
+            thoughts = Thought.objects.filter(owner=user).order_by('-created_at', '-id')
+            context = {
+                'request': Request(response.wsgi_request),
+                'format': suffix.lstrip('.') or None
+            }
+            expected = CamelCaseJSONRenderer().render(OrderedDict([
+                ('next', None),
+                ('results', ThoughtSerializer(thoughts, many=True, context=context).data)
+            ]))
+
+            self.assertEqual(expected, response.content)
+
+    def test_should_serve_repeated_timeline_pages_from_cache(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        ThoughtBuilder().with_thought('Lorem ipsum').with_owner(user).build().save()
+        before = thoughts_cache.stats.snapshot()
+
+        first_response = self.client.get(reverse('thought-list'), {'username': user.username})
+        with self.assertNumQueries(0):
+            second_response = self.client.get(reverse('thought-list'), {'username': user.username})
+
+        after = thoughts_cache.stats.snapshot()
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertEqual(1, after.get('timeline.misses', 0) - before.get('timeline.misses', 0))
+        self.assertEqual(1, after.get('timeline.hits', 0) - before.get('timeline.hits', 0))
+
+    def test_should_not_cache_timeline_pages_with_other_parameters(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        ThoughtBuilder().with_thought('Lorem ipsum').with_owner(user).build().save()
+        before = thoughts_cache.stats.snapshot()
+
+        for number in range(3):
+            self.client.get(reverse('thought-list'), {'username': user.username, 'bust': number})
+
+        after = thoughts_cache.stats.snapshot()
+        self.assertEqual(0, after.get('timeline.misses', 0) - before.get('timeline.misses', 0))
+
+    def test_should_not_list_thoughts_with_a_forged_cursor(self):
+        forged = urlsafe_b64encode(json.dumps({'p': [timezone.now().isoformat(), 1], 'n': 1}).encode()).decode()
+
+        response = self.client.get(reverse('thought-list'), {'username': 'breninho', 'cursor': forged})
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_should_invalidate_cached_timeline_when_publishing(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        ThoughtBuilder().with_thought('Lorem ipsum').with_owner(user).build().save()
+        self.client.get(reverse('thought-list'), {'username': user.username})
+        self.authenticate_user(user, '123456')
+
+        self.client.post(reverse('thought-list'), {'thought': 'Dolor sit amet'}, format='json')
+        response = self.client.get(reverse('thought-list'), {'username': user.username})
+
+        self.assertEqual(
+            ['Dolor sit amet', 'Lorem ipsum'],
+            [result['thought'] for result in response.data['results']]
+        )
+
+    def test_should_page_user_thoughts_by_offset_when_requested(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        for text in ('First', 'Second', 'Third'):
+            ThoughtBuilder().with_thought(text).with_owner(user).build().save()
+
+        response = self.client.get(
+            reverse('thought-list'),
+            {'username': user.username, 'offset': 1, 'limit': 1}
+        )
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, response.data['count'])
+        self.assertEqual('Second', response.data['results'][0]['thought'])
+
+    def test_should_count_offset_pages_from_the_owner_thought_counter(self):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .build()
+        user.save()
+        ThoughtBuilder().with_thought('First').with_owner(user).build().save()
+        UserThoughtCount.objects.filter(user=user).update(count=42)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('thought-list'), {'username': user.username, 'offset': 0})
+
+        self.assertEqual(42, response.data['count'])
+        self.assertEqual(['First'], [result['thought'] for result in response.data['results']])
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries))
+
+    def test_should_not_list_thoughts_with_an_invalid_cursor(self):
+        response = self.client.get(
+            reverse('thought-list'),
+            {'username': 'breninho', 'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
     def test_should_not_list_thoughts_if_user_filter_is_missing(self):
         response = self.client.get(reverse('thought-list'), format='json')
         self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
@@ -266,12 +662,129 @@ class ThoughtViewSetTest(ThoughtCaseMixin, AuthenticableTestMixin):
         )
 
 
+class ThoughtBulkCreateViewTest(AuthenticableTestMixin):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        cache.clear()
+        self.authenticate_user(self.user, '123456')
+
+    def test_should_publish_many_thoughts_at_once(self):
+        data = [{'thought': f'Lorem ipsum {number} #Lorem #Ipsum{number % 2}'} for number in range(10)]
+
+        response = self.client.post(reverse('thought-bulk-create'), data, format='json')
+
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual([item['thought'] for item in data], [item['thought'] for item in response.data])
+        thoughts = Thought.objects.order_by('id')
+        self.assertEqual(
+            [reverse('thought-detail', args=[thought.id], request=response.wsgi_request) for thought in thoughts],
+            [item['url'] for item in response.data]
+        )
+        self.assertEqual({self.user.id}, {thought.owner_id for thought in thoughts})
+        self.assertEqual(10, Hashtag.objects.get(hashtag='lorem').thoughts.count())
+        self.assertEqual(5, Hashtag.objects.get(hashtag='ipsum1').thoughts.count())
+        self.assertEqual(
+            {10, 5},
+            set(HashtagUsage.objects.values_list('count', flat=True))
+        )
+
+    def test_should_count_published_thoughts(self):
+        data = [{'thought': f'Lorem ipsum {number} #Lorem #Ipsum{number % 2}'} for number in range(10)]
+
+        self.client.post(reverse('thought-bulk-create'), data, format='json')
+        self.client.post(reverse('thought-bulk-create'), data[:1], format='json')
+
+        self.assertEqual(11, UserThoughtCount.objects.get(user=self.user).count)
+        self.assertEqual(
+            {'lorem': 11, 'ipsum0': 6, 'ipsum1': 5},
+            dict(Hashtag.objects.values_list('hashtag', 'thought_count'))
+        )
+
+    def test_should_publish_thoughts_with_the_same_queries_whatever_their_number(self):
+        url = reverse('thought-bulk-create')
+        self.client.post(url, [{'thought': 'Warm up #Lorem'}], format='json')
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(url, [{'thought': f'Few {number} #Lorem'} for number in range(2)], format='json')
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(url, [{'thought': f'Many {number} #Lorem'} for number in range(50)], format='json')
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(53, Thought.objects.count())
+
+    def test_should_not_publish_thoughts_of_a_deleted_user(self):
+        User.objects.filter(pk=self.user.pk).delete()
+
+        response = self.client.post(reverse('thought-bulk-create'), [{'thought': 'Lorem ipsum'}], format='json')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+        self.assertEqual('user_not_found', response.data['code'])
+        self.assertEqual(0, Thought.objects.count())
+
+    def test_should_not_publish_any_thought_when_one_is_invalid(self):
+        data = [{'thought': 'Lorem ipsum'}, {'thought': 'a' * 801}, {'thought': 'Dolor sit'}]
+
+        response = self.client.post(reverse('thought-bulk-create'), data, format='json')
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual({}, response.data[0])
+        self.assertIn('thought', response.data[1])
+        self.assertEqual({}, response.data[2])
+        self.assertFalse(Thought.objects.exists())
+
+    @override_settings(THOUGHTS_BULK_MAX=2)
+    def test_should_not_publish_more_thoughts_than_allowed(self):
+        data = [{'thought': 'Lorem ipsum'}] * 3
+
+        response = self.client.post(reverse('thought-bulk-create'), data, format='json')
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertFalse(Thought.objects.exists())
+
+    def test_should_not_publish_thoughts_that_are_not_a_list(self):
+        response = self.client.post(reverse('thought-bulk-create'), {'thought': 'Lorem ipsum'}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_should_not_publish_thoughts_anonymously(self):
+        self.client.credentials()
+
+        response = self.client.post(reverse('thought-bulk-create'), [{'thought': 'Lorem ipsum'}], format='json')
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_should_invalidate_cached_timeline(self):
+        self.client.get(reverse('thought-list'), {'username': self.user.username})
+
+        self.client.post(reverse('thought-bulk-create'), [{'thought': 'Lorem ipsum'}], format='json')
+        response = self.client.get(reverse('thought-list'), {'username': self.user.username})
+
+        self.assertEqual(['Lorem ipsum'], [result['thought'] for result in response.data['results']])
+
+    @override_settings(HASHTAG_INDEXING='async')
+    def test_should_leave_hashtags_to_the_worker_when_indexing_async(self):
+        data = [{'thought': '#Lorem'}, {'thought': '#Ipsum'}]
+
+        response = self.client.post(reverse('thought-bulk-create'), data, format='json')
+
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertFalse(Hashtag.objects.exists())
+
+
 class HashtagsTest(TestCase):
 
     def test_unique_hashtags_should_get_hashtags_in_text(self):
         hashtags = unique_hashtags('Aliquam varius, dui in bibendum eleifend. #Ipsum')
         self.assertEqual(len(hashtags), 1)
-        self.assertEqual(hashtags[0], 'Ipsum')
+        self.assertEqual(hashtags[0], 'ipsum')
 
     def test_unique_hashtags_should_return_empty_list_when_text_doesnot_have_hashtags(self):
         hashtags = unique_hashtags('Aliquam varius, dui in bibendum eleifend.')
@@ -280,22 +793,630 @@ class HashtagsTest(TestCase):
     def test_unique_hashtags_should_get_when_hashtags_doesnot_have_spaces_between_them(self):
         hashtags = unique_hashtags('Aliquam varius, dui in bibendum eleifend. #Lorem#Ipsum')
         self.assertEqual(len(hashtags), 2)
-        self.assertEqual(hashtags[0], 'Lorem')
-        self.assertEqual(hashtags[1], 'Ipsum')
+        self.assertEqual(hashtags[0], 'lorem')
+        self.assertEqual(hashtags[1], 'ipsum')
 
     def test_unique_hashtags_should_get_with_numbers(self):
         hashtags = unique_hashtags('Aliquam varius, dui in bibendum eleifend. #Lorem25')
         self.assertEqual(len(hashtags), 1)
-        self.assertEqual(hashtags[0], 'Lorem25')
+        self.assertEqual(hashtags[0], 'lorem25')
 
     def test_unique_hashtags_should_not_get_with_special_characters(self):
         hashtags = unique_hashtags('Aliquam varius,#@!efdsa #Lorem25. #Lorem26! dui in bibendum eleifend.')
         self.assertEqual(len(hashtags), 2)
-        self.assertEqual(hashtags[0], 'Lorem25')
-        self.assertEqual(hashtags[1], 'Lorem26')
+        self.assertEqual(hashtags[0], 'lorem25')
+        self.assertEqual(hashtags[1], 'lorem26')
 
     def test_unique_hashtags_should_discard_repeated_hashtags(self):
         hashtags = unique_hashtags('Aliquam varius #Lorem#Ipsum #Lorem#Ipsum #Lorem#Ipsum')
         self.assertEqual(len(hashtags), 2)
-        self.assertEqual(hashtags[0], 'Lorem')
-        self.assertEqual(hashtags[1], 'Ipsum')
+        self.assertEqual(hashtags[0], 'lorem')
+        self.assertEqual(hashtags[1], 'ipsum')
+
+    def test_unique_hashtags_should_casefold_hashtags(self):
+        hashtags = unique_hashtags('Aliquam #Lorem #LOREM #lorem #Straße #STRASSE')
+        self.assertEqual(hashtags, ['lorem', 'strasse'])
+
+    def test_unique_hashtags_should_normalize_compatibility_characters(self):
+        hashtags = unique_hashtags('Aliquam #\uff2c\uff4f\uff52\uff45\uff4d #Lorem')
+        self.assertEqual(hashtags, ['lorem'])
+
+    @override_settings(HASHTAGS_MAX_PER_THOUGHT=2)
+    def test_unique_hashtags_should_stop_at_max_hashtags_per_thought(self):
+        hashtags = unique_hashtags('#Lorem #lorem #Ipsum #Dolor #Sit')
+        self.assertEqual(hashtags, ['lorem', 'ipsum'])
+
+    def test_unique_hashtags_many_should_tokenize_each_text(self):
+        hashtags = unique_hashtags_many(['#Lorem #Ipsum', 'no hashtags', '#IPSUM'])
+        self.assertEqual(hashtags, [['lorem', 'ipsum'], [], ['ipsum']])
+
+
+class ThoughtDetailViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+        cls.thought = ThoughtBuilder().with_thought('Adipiscing ipsum dolor sit.')\
+                                      .with_owner(cls.user)\
+                                      .build()
+        cls.thought.save()
+        cls.url = reverse('thought-detail', kwargs={'pk': cls.thought.id})
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+
+    def test_should_serve_cached_thought_without_database(self):
+        first_response = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second_response = self.client.get(self.url)
+
+        self.assertEqual(status.HTTP_200_OK, second_response.status_code)
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertEqual(first_response['ETag'], second_response['ETag'])
+
+    def test_should_render_cached_thought_as_the_model_serializer_does(self):
+        response = self.client.get(self.url)
+
+        context = {'request': Request(response.wsgi_request), 'format': None}
+        expected = CamelCaseJSONRenderer().render(ThoughtSerializer(self.thought, context=context).data)
+        self.assertEqual(expected, response.content)
+
+    def test_should_answer_not_modified_for_matching_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        self.assertEqual(b'', response.content)
+
+    def test_should_answer_fresh_content_to_if_modified_since_after_owner_renames(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+
+        owner = User.objects.get(pk=self.user.pk)
+        owner.username = 'brenao'
+        with mock.patch('thoughts.models.transaction.on_commit', side_effect=lambda func: func()):
+            owner.save()
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('brenao', response.data['user']['username'])
+
+    def test_should_use_a_different_etag_per_format(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url.rstrip('/') + '.json', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_should_evict_cached_thought_when_owner_changes_username(self):
+        self.client.get(self.url)
+
+        owner = User.objects.get(pk=self.user.pk)
+        owner.username = 'brenao'
+        with mock.patch('thoughts.models.transaction.on_commit', side_effect=lambda func: func()):
+            owner.save()
+        response = self.client.get(self.url)
+
+        self.assertEqual('brenao', response.data['user']['username'])
+
+    def test_should_not_evict_cached_thoughts_when_owner_keeps_username(self):
+        owner = User.objects.get(pk=self.user.pk)
+        owner.first_name = 'Breno'
+
+        with mock.patch('thoughts.tasks.invalidate_owner_thoughts.delay') as delay, \
+                mock.patch('thoughts.models.transaction.on_commit', side_effect=lambda func: func()):
+            owner.save()
+
+        delay.assert_not_called()
+
+    def test_should_not_find_missing_thought(self):
+        response = self.client.get(reverse('thought-detail', kwargs={'pk': self.thought.id + 1}))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+
+class AsyncThoughtViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+        cls.thought = ThoughtBuilder().with_thought('Adipiscing ipsum dolor sit.')\
+                                      .with_owner(cls.user)\
+                                      .build()
+        cls.thought.save()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.factory = AsyncRequestFactory()
+        self.detail_url = reverse('thought-detail', kwargs={'pk': self.thought.id})
+        self.list_url = reverse('thought-list') + '?username=breninho'
+        self.detail_view = async_to_sync(ThoughtDetailView.as_async_view())
+        self.list_view = async_to_sync(ThoughtListView.as_async_view())
+
+    def test_should_read_thought_as_the_sync_view_does(self):
+        expected = self.client.get(self.detail_url)
+        cache.clear()
+
+        response = self.detail_view(self.factory.get(self.detail_url), pk=self.thought.id)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(expected.content, response.content)
+        self.assertEqual(expected['ETag'], response['ETag'])
+        self.assertEqual('application/json', response['Content-Type'])
+
+    def test_should_serve_cached_thought_without_database(self):
+        etag = self.detail_view(self.factory.get(self.detail_url), pk=self.thought.id)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.detail_view(self.factory.get(self.detail_url, **{'if-none-match': etag}), pk=self.thought.id)
+
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_should_not_find_missing_thought(self):
+        response = self.detail_view(self.factory.get(self.detail_url), pk=self.thought.id + 1)
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def test_should_list_thoughts_as_the_sync_view_does(self):
+        expected = self.client.get(self.list_url)
+        cache.clear()
+
+        response = self.list_view(self.factory.get(self.list_url))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(expected.content, response.content)
+
+    def test_should_not_list_thoughts_without_username(self):
+        response = self.list_view(self.factory.get(reverse('thought-list')))
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_should_reject_invalid_token_on_reads(self):
+        response = self.list_view(self.factory.get(self.list_url, authorization='Bearer invalid'))
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_should_publish_through_the_sync_dispatch(self):
+        request = self.factory.post(reverse('thought-list'), {'thought': 'Lorem'}, content_type='application/json')
+
+        response = self.list_view(request)
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+
+class TrendingHashtagsViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+
+    def publish(self, *texts):
+        for text in texts:
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+    def test_should_list_most_used_hashtags_of_the_window(self):
+        self.publish('#Lorem #Ipsum', '#Ipsum #Dolor', '#Ipsum #Lorem')
+        refresh_trending_hashtags.delay()
+
+        response = self.client.get(reverse('hashtag-trending'), {'window': '1h', 'limit': 2})
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('1h', response.data['window'])
+        self.assertEqual(
+            [{'hashtag': 'ipsum', 'uses': 3}, {'hashtag': 'lorem', 'uses': 2}],
+            response.data['results']
+        )
+
+    def test_should_serve_trending_hashtags_from_cache(self):
+        self.publish('#Lorem')
+        refresh_trending_hashtags.delay()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('hashtag-trending'))
+
+        self.assertEqual([{'hashtag': 'lorem', 'uses': 1}], response.data['results'])
+
+    def test_should_schedule_a_refresh_instead_of_computing_on_a_miss(self):
+        self.publish('#Lorem')
+
+        with mock.patch('thoughts.tasks.refresh_trending_hashtags.delay') as refresh:
+            with self.assertNumQueries(0):
+                first = self.client.get(reverse('hashtag-trending'))
+                second = self.client.get(reverse('hashtag-trending'))
+
+        self.assertEqual([], first.data['results'])
+        self.assertEqual([], second.data['results'])
+        refresh.assert_called_once_with()
+
+    def test_should_list_trending_hashtags_once_the_scheduled_refresh_lands(self):
+        self.publish('#Lorem')
+        self.client.get(reverse('hashtag-trending'))
+
+        response = self.client.get(reverse('hashtag-trending'))
+
+        self.assertEqual([{'hashtag': 'lorem', 'uses': 1}], response.data['results'])
+
+    def test_should_not_count_buckets_outside_the_window(self):
+        self.publish('#Lorem #Ipsum')
+        HashtagUsage.objects.filter(hashtag__hashtag='lorem')\
+                            .update(bucket=timezone.now() - timedelta(days=2))
+        refresh_trending_hashtags.delay()
+
+        day = self.client.get(reverse('hashtag-trending'), {'window': '24h'})
+        week = self.client.get(reverse('hashtag-trending'), {'window': '7d'})
+
+        self.assertEqual(['ipsum'], [result['hashtag'] for result in day.data['results']])
+        self.assertEqual(['lorem', 'ipsum'], [result['hashtag'] for result in week.data['results']])
+
+    def test_should_not_list_trending_hashtags_of_unknown_window(self):
+        response = self.client.get(reverse('hashtag-trending'), {'window': '1y'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_should_prune_buckets_older_than_their_windows(self):
+        self.publish('#Lorem')
+        HashtagUsage.objects.update(bucket=timezone.now() - timedelta(days=8))
+        self.publish('#Lorem')
+
+        prune_hashtag_usage.delay()
+
+        self.assertEqual(2, HashtagUsage.objects.count())
+        self.assertEqual({1}, set(HashtagUsage.objects.values_list('count', flat=True)))
+
+
+class HashtagThoughtListViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_should_list_thoughts_of_a_hashtag_newest_first(self):
+        for text in ('First #Lorem', 'Second #Ipsum', 'Third #Lorem #Ipsum'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('hashtag-thought-list', kwargs={'hashtag': 'Lorem'}))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(2, response.data['count'])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            ['Third #Lorem #Ipsum', 'First #Lorem'],
+            [result['thought'] for result in response.data['results']]
+        )
+        self.assertEqual(self.user.username, response.data['results'][0]['user']['username'])
+
+    def test_should_page_thoughts_of_a_hashtag_by_cursor(self):
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(f'Thought {number} #Lorem').with_owner(self.user).build()
+            for number in range(120)
+        )
+        register_hashtags(list(Thought.objects.all()))
+        expected = list(
+            Thought.objects.order_by('-created_at', '-id').values_list('thought', flat=True)
+        )
+
+        first_page = self.client.get(reverse('hashtag-thought-list', kwargs={'hashtag': 'Lorem'}))
+        second_page = self.client.get(first_page.data['next'])
+
+        self.assertEqual(100, len(first_page.data['results']))
+        self.assertIsNone(second_page.data['next'])
+        self.assertEqual(
+            expected,
+            [result['thought'] for result in first_page.data['results'] + second_page.data['results']]
+        )
+
+    def test_should_list_no_thoughts_of_unknown_hashtag(self):
+        response = self.client.get(reverse('hashtag-thought-list', kwargs={'hashtag': 'Unknown'}))
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([], response.data['results'])
+
+
+class ThoughtSearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .with_password('123456')\
+                                .build()
+        cls.user.save()
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_should_search_thoughts_best_ranked_first(self):
+        for text in ('Lorem dolor', 'Ipsum only', 'Lorem ipsum, lorem #Lorem', 'Dolor #lorem'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('thought-search'), {'q': 'LOREM'})
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIsNone(response.data['next'])
+        results = [result['thought'] for result in response.data['results']]
+        self.assertEqual('Lorem ipsum, lorem #Lorem', results[0])
+        self.assertCountEqual(['Lorem ipsum, lorem #Lorem', 'Lorem dolor', 'Dolor #lorem'], results)
+        self.assertEqual(self.user.username, response.data['results'][0]['user']['username'])
+
+    def test_should_search_thoughts_matching_every_word(self):
+        for text in ('Lorem dolor', 'Ipsum dolor lorem', 'Lorem ipsum'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+        response = self.client.get(reverse('thought-search'), {'q': 'dolor lorem'})
+
+        self.assertCountEqual(
+            ['Lorem dolor', 'Ipsum dolor lorem'],
+            [result['thought'] for result in response.data['results']]
+        )
+
+    def test_should_page_search_results_by_cursor(self):
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(' '.join(['lorem'] * (number % 3 + 1) + ['ipsum'] * number))
+                            .with_owner(self.user)
+                            .build()
+            for number in range(120)
+        )
+
+        first_page = self.client.get(reverse('thought-search'), {'q': 'lorem'})
+        second_page = self.client.get(first_page.data['next'])
+
+        self.assertEqual(100, len(first_page.data['results']))
+        self.assertIsNone(second_page.data['next'])
+        urls = [result['url'] for result in first_page.data['results'] + second_page.data['results']]
+        self.assertEqual(120, len(set(urls)))
+
+    @override_settings(SEARCH_MAX_MATCHES=2)
+    def test_should_rank_only_the_newest_matches(self):
+        for text in ('Lorem lorem lorem', 'Lorem ipsum', 'Lorem dolor', 'Ipsum dolor'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+        response = self.client.get(reverse('thought-search'), {'q': 'lorem'})
+
+        self.assertCountEqual(
+            ['Lorem ipsum', 'Lorem dolor'],
+            [result['thought'] for result in response.data['results']]
+        )
+
+    @override_settings(SEARCH_MAX_MATCHES=2)
+    def test_should_stop_paging_search_results_after_the_newest_matches(self):
+        for text in ('Lorem lorem lorem', 'Lorem ipsum', 'Lorem dolor'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+
+        first_page = self.client.get(reverse('thought-search'), {'q': 'lorem', 'limit': 1})
+        second_page = self.client.get(first_page.data['next'])
+
+        self.assertIsNone(second_page.data['next'])
+        self.assertCountEqual(
+            ['Lorem ipsum', 'Lorem dolor'],
+            [result['thought'] for result in first_page.data['results'] + second_page.data['results']]
+        )
+
+    def test_should_not_search_without_a_query(self):
+        response = self.client.get(reverse('thought-search'), {'q': '  '})
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_should_not_search_with_an_invalid_cursor(self):
+        response = self.client.get(reverse('thought-search'), {'q': 'lorem', 'cursor': 'invalid'})
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+
+class FeedViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = cls.create_user('breninho')
+        cls.followed = cls.create_user('brenoso')
+        cls.stranger = cls.create_user('brenao')
+        Follow.objects.create(follower=cls.reader, followed=cls.followed)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    @staticmethod
+    def create_user(username):
+        user = UserBuilder().with_username(username)\
+                            .with_email(f'{username}@breno.com')\
+                            .with_password('123456')\
+                            .build()
+        user.save()
+        return user
+
+    def publish(self, owner, *texts):
+        thoughts = [ThoughtBuilder().with_thought(text).with_owner(owner).build() for text in texts]
+        for thought in thoughts:
+            thought.save()
+        fan_out_thoughts.delay([thought.id for thought in thoughts])
+        return thoughts
+
+    def feed(self, **params):
+        response = self.client.get(reverse('feed'), params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return [result['thought'] for result in response.data['results']]
+
+    def test_should_list_own_and_followed_thoughts_newest_first(self):
+        self.publish(self.followed, 'Lorem')
+        self.publish(self.stranger, 'Ipsum')
+        self.publish(self.reader, 'Dolor')
+        self.publish(self.followed, 'Sit')
+
+        self.assertEqual(['Sit', 'Dolor', 'Lorem'], self.feed())
+        self.assertEqual(2, FeedEntry.objects.count())
+
+    def test_should_read_home_feed_with_the_same_queries_whatever_the_accounts_followed(self):
+        for number in range(20):
+            account = self.create_user(f'account{number}')
+            Follow.objects.create(follower=self.reader, followed=account)
+            self.publish(account, f'Thought {number}')
+        self.feed()
+
+        with self.assertNumQueries(3):
+            thoughts = self.feed()
+
+        self.assertEqual(20, len(thoughts))
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_should_read_thoughts_of_large_accounts_on_demand(self):
+        self.publish(self.followed, 'Lorem')
+        self.publish(self.stranger, 'Ipsum')
+
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(['Lorem'], self.feed())
+
+    def test_should_not_repeat_thoughts_of_accounts_that_became_large(self):
+        self.publish(self.followed, 'Lorem', 'Ipsum')
+
+        with override_settings(FEED_FANOUT_MAX_FOLLOWERS=1):
+            cache.clear()
+            self.assertEqual(['Ipsum', 'Lorem'], self.feed())
+
+    def test_should_page_home_feed_across_sources_by_cursor(self):
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(f'Thought {number}').with_owner(owner).build()
+            for number in range(60)
+            for owner in (self.reader, self.followed)
+        )
+        fan_out_thoughts.delay(list(Thought.objects.values_list('id', flat=True)))
+        expected = list(
+            Thought.objects.order_by('-created_at', '-id').values_list('thought', flat=True)
+        )
+
+        first_page = self.client.get(reverse('feed'))
+        second_page = self.client.get(first_page.data['next'])
+
+        self.assertEqual(100, len(first_page.data['results']))
+        self.assertIsNone(second_page.data['next'])
+        self.assertEqual(
+            expected,
+            [result['thought'] for result in first_page.data['results'] + second_page.data['results']]
+        )
+
+    def test_should_backfill_feed_when_following(self):
+        self.publish(self.stranger, 'Lorem', 'Ipsum')
+
+        Follow.objects.create(follower=self.reader, followed=self.stranger)
+        backfill_follower_feed.delay(self.reader.id, self.stranger.id)
+
+        self.assertEqual(['Ipsum', 'Lorem'], self.feed())
+
+    def test_should_remove_thoughts_when_unfollowing(self):
+        self.publish(self.followed, 'Lorem')
+
+        Follow.objects.filter(follower=self.reader, followed=self.followed).delete()
+
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual([], self.feed())
+
+    @override_settings(FEED_MAX_ENTRIES=2)
+    def test_should_trim_feeds_to_their_newest_entries(self):
+        self.publish(self.followed, 'Lorem', 'Ipsum', 'Dolor')
+
+        trim_home_feeds.delay()
+
+        self.assertEqual(['Dolor', 'Ipsum'], self.feed())
+
+    @override_settings(FEED_MAX_ENTRIES=2, FEED_TRIM_BATCH_SIZE=1)
+    def test_should_trim_every_feed_batch_by_batch(self):
+        Follow.objects.create(follower=self.stranger, followed=self.followed)
+        Follow.objects.create(follower=self.followed, followed=self.reader)
+        self.publish(self.followed, 'Lorem', 'Ipsum', 'Dolor')
+        self.publish(self.reader, 'Sit')
+
+        trim_home_feeds.delay()
+
+        for reader in (self.reader, self.stranger):
+            self.assertEqual(
+                ['Dolor', 'Ipsum'],
+                list(FeedEntry.objects.filter(reader=reader)
+                                      .order_by('-thought_created_at', '-thought_id')
+                                      .values_list('thought__thought', flat=True))
+            )
+        self.assertEqual(1, FeedEntry.objects.filter(reader=self.followed).count())
+
+    def test_should_list_global_feed(self):
+        self.publish(self.stranger, 'Lorem')
+        self.publish(self.followed, 'Ipsum')
+        self.client.force_authenticate(None)
+
+        self.assertEqual(['Ipsum', 'Lorem'], self.feed(scope='global'))
+
+    def test_should_not_list_home_feed_anonymously(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
+
+    def test_should_not_list_feed_of_unknown_scope(self):
+        response = self.client.get(reverse('feed'), {'scope': 'friends'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+class ReconcileThoughtCountsTaskTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserBuilder().with_username('breninho')\
+                                .with_email('brenoninho@breno.com')\
+                                .build()
+        cls.user.save()
+        cls.other_user = UserBuilder().with_username('brenoso')\
+                                      .with_email('brenoso@breno.com')\
+                                      .build()
+        cls.other_user.save()
+
+    def test_should_correct_drifted_counts(self):
+        for text in ('First #Lorem', 'Second #Lorem #Ipsum'):
+            ThoughtBuilder().with_thought(text).with_owner(self.user).build().save()
+        ThoughtBuilder().with_thought('Deleted #Ipsum').with_owner(self.other_user).build().save()
+        Thought.objects.filter(owner=self.other_user).delete()
+        UserThoughtCount.objects.filter(user=self.user).update(count=7)
+        Hashtag.objects.filter(hashtag='lorem').update(thought_count=0)
+
+        reconcile_thought_counts.delay()
+
+        self.assertEqual(
+            {self.user.id: 2, self.other_user.id: 0},
+            dict(UserThoughtCount.objects.values_list('user_id', 'count'))
+        )
+        self.assertEqual({'lorem': 2, 'ipsum': 1}, dict(Hashtag.objects.values_list('hashtag', 'thought_count')))
+
+    def test_should_count_thoughts_inserted_without_counting(self):
+        Thought.objects.bulk_create(
+            ThoughtBuilder().with_thought(f'Thought {number}').with_owner(self.user).build()
+            for number in range(3)
+        )
+
+        reconcile_thought_counts.delay()
+
+        self.assertEqual(3, UserThoughtCount.objects.get(user=self.user).count)
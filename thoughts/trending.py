@@ -0,0 +1,57 @@
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from thoughts.cache import stats
+from thoughts.models import Hashtag, HashtagUsage, floor_bucket
+
+
+REFRESH_SCHEDULED_KEY = 'trending:refresh-scheduled'
+
+
+def _trending_key(window: str) -> str:
+    return f'trending:{window}'
+
+
+def get_trending_hashtags(window: str) -> List[dict]:
+    """Top hashtags of ``window`` as last cached by the refresh task.
+
+    Requests never sum the rollup: on a miss, before the first refresh or
+    after the cache was flushed, a refresh is scheduled and no hashtags are
+    listed until it lands.
+    """
+    hashtags = cache.get(_trending_key(window))
+    if hashtags is not None:
+        stats.hit('trending')
+        return hashtags
+    stats.miss('trending')
+    if cache.add(REFRESH_SCHEDULED_KEY, 1, settings.TRENDING_REFRESH_INTERVAL):
+        from thoughts.tasks import refresh_trending_hashtags
+        refresh_trending_hashtags.delay()
+    return []
+
+
+def cache_trending_hashtags():
+    # Entries outlive a few refreshes, so a late beat keeps serving the
+    # previous top hashtags instead of emptying the endpoint.
+    for window in settings.TRENDING_WINDOWS:
+        cache.set(_trending_key(window), compute_trending_hashtags(window), settings.TRENDING_CACHE_TIMEOUT)
+
+
+def compute_trending_hashtags(window: str) -> List[dict]:
+    length, resolution = settings.TRENDING_WINDOWS[window]
+    since = floor_bucket(timezone.now() - timedelta(seconds=length), resolution)
+    top = list(
+        HashtagUsage.objects.filter(resolution=resolution, bucket__gt=since)
+                            .values('hashtag_id')
+                            .annotate(uses=Sum('count'))
+                            .order_by('-uses', 'hashtag_id')[:settings.TRENDING_MAX_RESULTS]
+    )
+    names = dict(
+        Hashtag.objects.filter(id__in=[row['hashtag_id'] for row in top]).values_list('id', 'hashtag')
+    )
+    return [{'hashtag': names[row['hashtag_id']], 'uses': row['uses']} for row in top]
@@ -1,18 +1,55 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework.urlpatterns import format_suffix_patterns
 
-from thoughts.views import ThoughtListView, ThoughtDetailView
+from thoughts.views import (
+    FeedView, HashtagThoughtListView, ThoughtBulkCreateView, ThoughtListView, ThoughtDetailView, ThoughtSearchView,
+    TrendingHashtagsView
+)
+
+
+if settings.ASYNC_VIEWS:
+    thought_list_view = ThoughtListView.as_async_view()
+    thought_detail_view = ThoughtDetailView.as_async_view()
+else:
+    thought_list_view = ThoughtListView.as_view()
+    thought_detail_view = ThoughtDetailView.as_view()
 
 
 urlpatterns = format_suffix_patterns([
     path(
         'api/thoughts',
-        ThoughtListView.as_view(),
+        thought_list_view,
         name='thought-list'
     ),
+    path(
+        'api/thoughts/bulk',
+        ThoughtBulkCreateView.as_view(),
+        name='thought-bulk-create'
+    ),
+    path(
+        'api/thoughts/search',
+        ThoughtSearchView.as_view(),
+        name='thought-search'
+    ),
     path(
         'api/thoughts/<int:pk>/',
-        ThoughtDetailView.as_view(),
+        thought_detail_view,
         name='thought-detail'
+    ),
+    path(
+        'api/feed',
+        FeedView.as_view(),
+        name='feed'
+    ),
+    path(
+        'api/hashtags/trending',
+        TrendingHashtagsView.as_view(),
+        name='hashtag-trending'
+    ),
+    path(
+        'api/hashtags/<str:hashtag>/thoughts',
+        HashtagThoughtListView.as_view(),
+        name='hashtag-thought-list'
     )
 ])
@@ -1,36 +1,148 @@
+import hashlib
 import logging
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import transaction
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework import generics, status
+from rest_framework.exceptions import NotAuthenticated, NotFound
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from iam.exceptions import UsernameError
-from thoughts.models import Thought
-from thoughts.serializers import ThoughtSerializer
+from thoughts.cache import aget_thought_entry, aget_timeline_page, get_thought_entry, get_timeline_page
+from thoughts.counters import get_user_thought_count
+from thoughts.feeds import get_home_feed_sources
+from thoughts.hashtags import normalize_hashtag
+from thoughts.models import Hashtag, HashtagThought, Thought
+from thoughts.pagination import (
+    CounterLimitOffsetPagination, FeedCursorPagination, HashtagCursorPagination, SearchCursorPagination,
+    TimelineCursorPagination
+)
+from thoughts.search import search_thoughts
+from thoughts.serializers import ThoughtRowSerializer, ThoughtSerializer, link_to_row
+from thoughts.trending import get_trending_hashtags
+from thoughtsapi.instrumentation import timing_render
 
 
 logger = logging.getLogger(__name__)
 
 
-class ThoughtListView(generics.ListCreateAPIView):
+class AsyncReadMixin:
+    """Serves GET from a coroutine when the view is mounted with ``as_async_view``.
+
+    Under ASGI a synchronous view runs on the thread-sensitive executor,
+    a single thread shared by every request, so reads would queue behind
+    each other. The coroutine handler, ``aget``, awaits the cache on the
+    thread pool and only crosses to that thread for the database.
+    Other methods keep the synchronous DRF dispatch.
+    """
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        sync_view = sync_to_async(cls.as_view(**initkwargs), thread_sensitive=True)
+
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_view(request, *args, **kwargs)
+            return await cls(**initkwargs).async_dispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.csrf_exempt = True
+        return view
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            # Credentials may need the database (revoked tokens, legacy
+            # tokens); anonymous reads are checked without leaving the loop.
+            if 'HTTP_AUTHORIZATION' in request.META:
+                await sync_to_async(self.initial, thread_sensitive=True)(request, *args, **kwargs)
+            else:
+                self.initial(request, *args, **kwargs)
+            response = await self.aget(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        if isinstance(self.response, Response):
+            with timing_render():
+                self.response.render()
+            return self.detach(self.response)
+        return self.response
+
+    def detach(self, response):
+        # Django renders template responses on the thread-sensitive executor;
+        # a plain response with the rendered content skips that hop.
+        detached = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            detached[header] = value
+        return detached
+
+
+class ThoughtListView(AsyncReadMixin, generics.ListCreateAPIView):
     serializer_class = ThoughtSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cached_page_params = {'username', 'cursor', 'limit', 'format'}
+
+    @property
+    def paginator(self):
+        # Clients that still page with ?offset= keep the counted offset pages,
+        # counted by the owner's thought counter.
+        if not hasattr(self, '_paginator'):
+            if LimitOffsetPagination.offset_query_param in self.request.query_params:
+                self._paginator = CounterLimitOffsetPagination(lambda: get_user_thought_count(self.get_username()))
+            else:
+                self._paginator = TimelineCursorPagination()
+        return self._paginator
 
     def list(self, request, *args, **kwargs):
         try:
-            response = super(ThoughtListView, self).list(request, *args, **kwargs)
+            username = self.get_username()
+            page = self.get_cached_page()
+            if page is not None:
+                data = get_timeline_page(username, page, self.get_page_data)
+            else:
+                data = self.get_page_data()
+            response = Response(data)
+            response.camelized = True
             logger.info(f"THOUGHT-VIEW-SET: Listed thoughts, request: {request}.")
             return response
         except UsernameError:
-            logger.warning(f"THOUGHT-VIEW-SET: Could not list thoughts, username missing. request: {request}.")
-            data = {
-                "error": "Bad Request (400)",
-                "message": "You must filter by an username"
-            }
-            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+            return self.username_missing(request)
+
+    async def aget(self, request, *args, **kwargs):
+        try:
+            username = self.get_username()
+            compute = sync_to_async(self.get_page_data, thread_sensitive=True)
+            page = self.get_cached_page()
+            if page is not None:
+                data = await aget_timeline_page(username, page, compute)
+            else:
+                data = await compute()
+            response = Response(data)
+            response.camelized = True
+            logger.info(f"THOUGHT-VIEW-SET: Listed thoughts, request: {request}.")
+            return response
+        except UsernameError:
+            return self.username_missing(request)
+
+    def username_missing(self, request):
+        logger.warning(f"THOUGHT-VIEW-SET: Could not list thoughts, username missing. request: {request}.")
+        data = {
+            "error": "Bad Request (400)",
+            "message": "You must filter by an username"
+        }
+        return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -38,20 +150,205 @@ class ThoughtListView(generics.ListCreateAPIView):
         logger.info(f"THOUGHT-VIEW-SET: Created a thought {request.data}.")
         return response
 
-    def get_queryset(self):
+    def get_username(self):
         username = self.request.query_params.get('username', None)
-        if username is not None:
-            return Thought.objects.filter(owner__username=username)
-        raise UsernameError("Username not provided")
+        if username is None:
+            raise UsernameError("Username not provided")
+        return username
+
+    def get_queryset(self):
+        return Thought.objects.filter(owner__username=self.get_username())\
+                              .select_related('owner')\
+                              .order_by('-created_at', '-id')
+
+    def get_cached_page(self):
+        """What the timeline page depends on, or None when it is not cached.
+
+        Only the first TIMELINE_CACHE_PAGES cursor pages of requests without
+        other parameters are cached, so a client can not fill the cache with
+        variants; the page number comes from the signed cursor.
+        """
+        if not isinstance(self.paginator, TimelineCursorPagination):
+            return None
+        if not set(self.request.query_params) <= self.cached_page_params:
+            return None
+        cursor = self.paginator.decode_cursor(self.request)
+        if cursor is not None and cursor.page_number > settings.TIMELINE_CACHE_PAGES:
+            return None
+        return (
+            self.request.build_absolute_uri(self.request.path),
+            None if cursor is None else self.request.query_params[self.paginator.cursor_query_param],
+            self.paginator.get_page_size(self.request),
+            self.request.query_params.get('format')
+        )
+
+    def get_page_data(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.values(*ThoughtRowSerializer.values_fields))
+        serializer = ThoughtRowSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data).data
+
+
+class ThoughtBulkCreateView(generics.GenericAPIView):
+    serializer_class = ThoughtSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
 
+    @transaction.atomic
+    def post(self, request, format=None):
+        if not isinstance(request.data, list) or not 0 < len(request.data) <= settings.THOUGHTS_BULK_MAX:
+            logger.warning(f"THOUGHT-VIEW-SET: Could not create thoughts in bulk, invalid batch. request: {request}.")
+            data = {
+                "error": "Bad Request (400)",
+                "message": f"You must send a list of 1 to {settings.THOUGHTS_BULK_MAX} thoughts"
+            }
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
-class ThoughtDetailView(generics.RetrieveAPIView):
-    queryset = Thought.objects.all()
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        logger.info(f"THOUGHT-VIEW-SET: Created {len(serializer.instance)} thoughts in bulk.")
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ThoughtDetailView(AsyncReadMixin, generics.RetrieveAPIView):
+    queryset = Thought.objects.select_related('owner')
     serializer_class = ThoughtSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-    @method_decorator(cache_page(60 * 60 * 2))
     def get(self, request, pk, format=None):
-        response = super(ThoughtDetailView, self).get(request, pk, format)
+        entry = get_thought_entry(pk, lambda: self.get_entry(pk))
+        return self.entry_response(request, pk, entry, format)
+
+    async def aget(self, request, pk, format=None):
+        entry = await aget_thought_entry(pk, sync_to_async(lambda: self.get_entry(pk), thread_sensitive=True))
+        return self.entry_response(request, pk, entry, format)
+
+    def entry_response(self, request, pk, entry, format):
+        if entry is None:
+            raise NotFound()
+
+        # URLs in the payload carry the format suffix, so the ETag does too.
+        # No Last-Modified: the payload embeds the owner's username, which
+        # changes without the thought's created_at; the digest covers both.
+        etag = quote_etag(f"{entry['digest']}.{format}" if format else entry['digest'])
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            serializer = ThoughtRowSerializer(entry['row'], context=self.get_serializer_context())
+            response = Response(serializer.data)
+            response.camelized = True
+        response['ETag'] = etag
         logger.info(f"THOUGHT-VIEW-SET: got Thought {pk}.")
         return response
+
+    def get_entry(self, pk):
+        row = Thought.objects.filter(pk=pk).values(*ThoughtRowSerializer.values_fields).first()
+        if row is None:
+            return None
+        return {
+            'row': row,
+            'digest': hashlib.md5(repr(sorted(row.items())).encode()).hexdigest()
+        }
+
+
+class ThoughtSearchView(generics.ListAPIView):
+    serializer_class = ThoughtSerializer
+    pagination_class = SearchCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            logger.warning(f"THOUGHT-SEARCH-VIEW: Could not search thoughts, query missing. request: {request}.")
+            data = {
+                "error": "Bad Request (400)",
+                "message": "You must send a search query in q"
+            }
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(
+            search_thoughts(text).values(*ThoughtRowSerializer.values_fields, 'rank')
+        )
+        serializer = ThoughtRowSerializer(page, many=True, context=self.get_serializer_context())
+        response = self.get_paginated_response(serializer.data)
+        response.camelized = True
+        logger.info(f"THOUGHT-SEARCH-VIEW: Searched thoughts, request: {request}.")
+        return response
+
+
+class FeedView(generics.ListAPIView):
+    serializer_class = ThoughtSerializer
+    pagination_class = FeedCursorPagination
+    scopes = ('home', 'global')
+
+    def list(self, request, *args, **kwargs):
+        scope = request.query_params.get('scope', 'home')
+        if scope not in self.scopes:
+            data = {
+                "error": "Bad Request (400)",
+                "message": f"scope must be one of {', '.join(self.scopes)}"
+            }
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+        if scope == 'global':
+            page = self.paginate_queryset(Thought.objects.values(*ThoughtRowSerializer.values_fields))
+        else:
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            sources = get_home_feed_sources(request.user.id)
+            page = [
+                row if 'id' in row else link_to_row(row)
+                for row in self.paginator.paginate_sources(sources, request, view=self)
+            ]
+        serializer = ThoughtRowSerializer(page, many=True, context=self.get_serializer_context())
+        response = self.get_paginated_response(serializer.data)
+        response.camelized = True
+        logger.info(f"FEED-VIEW: Listed {scope} feed, request: {request}.")
+        return response
+
+
+class TrendingHashtagsView(APIView):
+
+    def get(self, request, format=None):
+        window = request.query_params.get('window', '24h')
+        if window not in settings.TRENDING_WINDOWS:
+            data = {
+                "error": "Bad Request (400)",
+                "message": f"window must be one of {', '.join(settings.TRENDING_WINDOWS)}"
+            }
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), settings.TRENDING_MAX_RESULTS)
+        except ValueError:
+            limit = 10
+
+        hashtags = get_trending_hashtags(window)
+        logger.info(f"HASHTAG-VIEW: Listed trending hashtags, window: {window}.")
+        return Response({'window': window, 'results': hashtags[:max(limit, 0)]})
+
+
+class HashtagThoughtListView(generics.ListAPIView):
+    serializer_class = ThoughtSerializer
+    pagination_class = HashtagCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        rows = [link_to_row(link) for link in page]
+        serializer = ThoughtRowSerializer(rows, many=True, context=self.get_serializer_context())
+        response = self.get_paginated_response(serializer.data)
+        response.data['count'] = self.thought_count
+        response.camelized = True
+        logger.info(f"HASHTAG-VIEW: Listed thoughts of hashtag {kwargs['hashtag']}.")
+        return response
+
+    def get_queryset(self):
+        hashtag_id, self.thought_count = Hashtag.objects.filter(hashtag=normalize_hashtag(self.kwargs['hashtag']))\
+                                                        .values_list('id', 'thought_count')\
+                                                        .first() or (None, 0)
+        if hashtag_id is None:
+            return HashtagThought.objects.none()
+        return HashtagThought.objects.filter(hashtag_id=hashtag_id).values(
+            'thought_id',
+            'thought_created_at',
+            'thought__thought',
+            'thought__owner_id',
+            'thought__owner__username'
+        )
@@ -0,0 +1,42 @@
+from django.db.backends.postgresql import base, creation
+
+from thoughtsapi.db.postgresql_pool.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # Pooled connections to the test database would keep it from being
+    # dropped or used as a template.
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        self.connection.close()
+        close_pools()
+        super(DatabaseCreation, self)._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super(DatabaseCreation, self)._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend that checks connections out of a per-process pool.
+
+    Closing the connection, which Django does at the end of every request
+    while CONN_MAX_AGE is 0, returns it to the pool instead.
+    """
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        key = repr(sorted(conn_params.items()))
+        self.pool = get_pool(
+            key,
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            self.settings_dict['POOL']
+        )
+        connection = self.pool.acquire()
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,230 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+import psycopg2
+from psycopg2 import extensions
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Bounded pool of open psycopg2 connections.
+
+    At most ``max_size`` connections are checked out at once; callers past
+    that wait up to ``timeout`` seconds for one to be released and then get
+    an OperationalError instead of opening connections until the server
+    refuses them. A connection idle for more than ``check_after`` seconds is
+    pinged before it is handed out, and one older than ``max_lifetime``
+    seconds is closed instead of being reused.
+    """
+
+    def __init__(self, connect: Callable, max_size: int, timeout: float, max_lifetime: float, check_after: float,
+                 report_interval: float = 60):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.report_interval = report_interval
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # Most recently released last, so busy periods reuse the warm connections.
+        self._idle = []
+        self._opened_at = {}
+        self._reported_at = time.monotonic()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+            'opened': 0,
+            'discarded': 0,
+        }
+
+    def acquire(self):
+        started_at = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                logger.warning(f"DATABASE-POOL: No connection freed up in {self.timeout}s, {self.snapshot()}.")
+                raise psycopg2.OperationalError(
+                    f'connection pool exhausted: {self.max_size} connections in use for {self.timeout}s'
+                )
+            waited = time.monotonic() - started_at
+            with self._lock:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += waited
+                self._stats['max_wait_time'] = max(self._stats['max_wait_time'], waited)
+        try:
+            connection = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+        self._report()
+        return connection
+
+    def release(self, connection):
+        try:
+            if self._is_reusable(connection):
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close the idle connections; checked out ones are closed when released."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.max_lifetime = 0
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+            size = len(self._opened_at)
+            stats = dict(self._stats)
+        stats.update(size=size, idle=idle, in_use=size - idle, max_size=self.max_size)
+        return stats
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                connection = self.connect()
+                with self._lock:
+                    self._opened_at[connection] = time.monotonic()
+                    self._stats['opened'] += 1
+                return connection
+            connection, released_at = entry
+            if self._is_healthy(connection, released_at):
+                return connection
+            self._discard(connection)
+
+    def _is_healthy(self, connection, released_at: float) -> bool:
+        if connection.closed or self._is_expired(connection):
+            return False
+        if time.monotonic() - released_at < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _is_reusable(self, connection) -> bool:
+        if connection.closed or self._is_expired(connection):
+            return False
+        try:
+            # A transaction left open, or aborted, would leak into the next checkout.
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            return connection.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+        except psycopg2.Error:
+            return False
+
+    def _is_expired(self, connection) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(connection, 0)
+        return time.monotonic() - opened_at >= self.max_lifetime
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened_at.pop(connection, None)
+            self._stats['discarded'] += 1
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def _report(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._reported_at < self.report_interval:
+                return
+            self._reported_at = now
+        logger.info(f"DATABASE-POOL: {self.snapshot()}.")
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+# Connections inherited from the parent process share its sockets; closing
+# them in the child would close the parent's sessions, so they are only kept.
+_inherited = []
+
+
+def get_pool(key: str, connect: Callable, options: dict) -> ConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            make_psycopg2_green()
+            pool = _pools[key] = ConnectionPool(connect, **options)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats() -> Dict[str, dict]:
+    with _pools_lock:
+        pools = dict(_pools)
+    return {key: pool.snapshot() for key, pool in pools.items()}
+
+
+def _forget_inherited_pools():
+    global _pools_lock
+    _inherited.extend(_pools.values())
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_inherited_pools)
+
+
+def make_psycopg2_green():
+    """Make psycopg2 yield to other greenlets while it waits on the server.
+
+    Without a wait callback libpq blocks on its socket, so under gevent a
+    query holds the whole worker; with it psycopg2 polls and gevent switches
+    greenlets until the socket is ready.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return
+    if monkey.is_module_patched('socket') and extensions.get_wait_callback() is None:
+        extensions.set_wait_callback(_gevent_wait_callback)
+
+
+def _gevent_wait_callback(connection, timeout=None):
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f'Bad result from poll: {state}')
@@ -0,0 +1,47 @@
+import random
+from contextlib import contextmanager
+from typing import Optional
+
+from asgiref.local import Local
+from django.conf import settings
+
+
+# Whether reads of the current request must see its writes; None outside
+# requests, where tasks and commands read what they or a request just wrote.
+_state = Local()
+
+
+def is_pinned() -> bool:
+    return getattr(_state, 'pinned', None) is not False
+
+
+@contextmanager
+def pinned_to_primary(pinned: Optional[bool] = True):
+    previous = getattr(_state, 'pinned', None)
+    _state.pinned = previous or pinned
+    try:
+        yield
+    finally:
+        _state.pinned = previous
+
+
+class ReplicaRouter:
+    """Reads go to a random replica of DATABASE_REPLICAS, writes to ``default``.
+
+    Reads stay on ``default`` while the request is pinned to it; see
+    PrimaryPinningMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or is_pinned():
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
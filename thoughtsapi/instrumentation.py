@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from rest_framework import serializers
+
+
+class RequestMetrics:
+    """Where the time of one request went."""
+
+    __slots__ = (
+        'queries', 'db_time', 'cache_hits', 'cache_misses', 'serialize_time', 'render_time',
+        'render_started_at'
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.render_started_at = None
+
+    def record_query(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started_at
+
+    def start_render(self):
+        self.render_started_at = time.perf_counter()
+
+    def end_render(self, response=None):
+        if self.render_started_at is not None:
+            self.render_time += time.perf_counter() - self.render_started_at
+            self.render_started_at = None
+
+    def server_timing(self, total_time: float) -> str:
+        return ', '.join([
+            f'db;dur={self.db_time * 1e3:.1f};desc="{self.queries} queries"',
+            f'cache;desc="hits={self.cache_hits} misses={self.cache_misses}"',
+            f'serialize;dur={self.serialize_time * 1e3:.1f}',
+            f'render;dur={self.render_time * 1e3:.1f}',
+            f'total;dur={total_time * 1e3:.1f}',
+        ])
+
+    def as_log_fields(self, total_time: float) -> dict:
+        return {
+            'db_queries': self.queries,
+            'db_time_ms': round(self.db_time * 1e3, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'serialize_time_ms': round(self.serialize_time * 1e3, 2),
+            'render_time_ms': round(self.render_time * 1e3, 2),
+            'total_time_ms': round(total_time * 1e3, 2),
+        }
+
+
+# Metrics of the sampled request being handled, if any. A context variable
+# follows the request across greenlets, threads and coroutines.
+current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar('current_metrics', default=None)
+
+
+def record_cache_lookup(hit: bool):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+@contextmanager
+def timing_render():
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    metrics.start_render()
+    try:
+        yield
+    finally:
+        metrics.end_render()
+
+
+class TimedSerializerMixin:
+    """Adds the time spent building ``.data`` to the request metrics."""
+
+    @property
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super(TimedSerializerMixin, self).data
+        started_at = time.perf_counter()
+        try:
+            return super(TimedSerializerMixin, self).data
+        finally:
+            metrics.serialize_time += time.perf_counter() - started_at
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
@@ -0,0 +1,109 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from thoughtsapi.db.routers import pinned_to_primary
+from thoughtsapi.instrumentation import RequestMetrics, current_metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrimaryPinningMiddleware:
+    """Pins the reads of a request to the primary database when they must see a write.
+
+    Requests that write are pinned, and so are the requests of their user
+    for DATABASE_PIN_SECONDS after a successful write, so a user reads
+    their own writes while replicas catch up. The user is read from the
+    access token claims; the view still authenticates it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        user_id = self.get_token_user_id(request)
+        writes = request.method not in SAFE_METHODS
+        pinned = writes or (user_id is not None and cache.get(self.pin_key(user_id)) is not None)
+        with pinned_to_primary(pinned):
+            response = self.get_response(request)
+        if writes and user_id is not None and response.status_code < 400:
+            cache.set(self.pin_key(user_id), 1, settings.DATABASE_PIN_SECONDS)
+        return response
+
+    def get_token_user_id(self, request) -> Optional[int]:
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        try:
+            return AccessToken(raw_token).get(api_settings.USER_ID_CLAIM)
+        except TokenError:
+            return None
+
+    def pin_key(self, user_id: int) -> str:
+        return f'db:pinned:{user_id}'
+
+
+class RequestMetricsMiddleware:
+    """Reports where the time of a request went, per route.
+
+    A REQUEST_METRICS_SAMPLE_RATE share of the requests is measured: query
+    count and database time, cache hits and misses, serializer, render and
+    total time. They are sent back as a ``Server-Timing`` header and logged
+    as structured fields. Requests left out of the sample are not touched.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started_at = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        total_time = time.perf_counter() - started_at
+
+        response['Server-Timing'] = metrics.server_timing(total_time)
+        route = request.resolver_match.view_name if request.resolver_match else None
+        logger.info(
+            f"REQUEST-METRICS: {request.method} {route} {response.status_code}",
+            extra={
+                'route': route,
+                'method': request.method,
+                'status_code': response.status_code,
+                **metrics.as_log_fields(total_time)
+            }
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.start_render()
+            response.add_post_render_callback(metrics.end_render)
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -17,6 +18,8 @@ import dj_database_url
 
 ENV = os.environ.get("ENV", "local")
 
+TESTING = sys.argv[1:2] == ["test"]
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,7 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'thoughtsapi.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'thoughtsapi.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,12 +81,87 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'thoughtsapi.wsgi.application'
 
+TEST_RUNNER = 'common.testing.runner.TimedTestRunner'
+
+# Mount the coroutine GET handlers of the thought views; thoughtsapi.asgi
+# turns this on, since under WSGI every coroutine would need its own loop.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", None) == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
 DATABASES = {"default": dj_database_url.config()}
-DATABASES["default"]["ENGINE"] = "django.db.backends.postgresql"
+# Connections come from a per-process pool, bounded so that WEB_CONCURRENCY
+# workers of DATABASE_POOL_MAX_SIZE connections stay under max_connections.
+# Django returns them to the pool at the end of every request.
+DATABASES["default"]["ENGINE"] = "thoughtsapi.db.postgresql_pool"
+DATABASES["default"]["POOL"] = {
+    "max_size": int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+    "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 5)),
+    "max_lifetime": float(os.environ.get("DATABASE_POOL_MAX_LIFETIME", 60 * 30)),
+    "check_after": float(os.environ.get("DATABASE_POOL_CHECK_AFTER", 30)),
+    "report_interval": float(os.environ.get("DATABASE_POOL_REPORT_INTERVAL", 60)),
+}
+
+# Read replicas, as comma separated URLs. Safe reads go to a random replica
+# unless the request writes, or its user wrote in the last
+# DATABASE_PIN_SECONDS; cache fills and background tasks read the primary.
+# Tests only use the primary, whose test transactions a replica never sees.
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_URLS = "" if TESTING else os.environ.get("DATABASE_REPLICA_URLS", "")
+for index, url in enumerate(filter(None, DATABASE_REPLICA_URLS.split(","))):
+    alias = f"replica{index}"
+    DATABASES[alias] = {
+        **dj_database_url.parse(url.strip()),
+        "ENGINE": DATABASES["default"]["ENGINE"],
+        "POOL": DATABASES["default"]["POOL"],
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["thoughtsapi.db.routers.ReplicaRouter"]
+DATABASE_PIN_SECONDS = int(os.environ.get("DATABASE_PIN_SECONDS", 5))
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHE_URL = os.environ.get("CACHE_URL", os.environ.get("REDIS_URL", "redis://"))
+if TESTING or CACHE_URL.startswith("locmem://"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+else:
+    CACHES = {"default": {"BACKEND": "django_redis.cache.RedisCache", "LOCATION": CACHE_URL}}
+
+# Seconds a cache fill lock is held, and waited for by concurrent readers.
+CACHE_LOCK_TIMEOUT = int(os.environ.get("CACHE_LOCK_TIMEOUT", 10))
+CACHE_LOCK_WAIT = float(os.environ.get("CACHE_LOCK_WAIT", 0.5))
+
+TIMELINE_CACHE_PAGES = int(os.environ.get("TIMELINE_CACHE_PAGES", 3))
+TIMELINE_CACHE_TIMEOUT = int(os.environ.get("TIMELINE_CACHE_TIMEOUT", 60 * 5))
+THOUGHT_CACHE_TIMEOUT = int(os.environ.get("THOUGHT_CACHE_TIMEOUT", 60 * 60 * 2))
+THOUGHT_CACHE_EVICTION_BATCH_SIZE = int(os.environ.get("THOUGHT_CACHE_EVICTION_BATCH_SIZE", 1000))
+
+# Trending hashtag windows: name -> (window length, bucket resolution), in seconds.
+TRENDING_WINDOWS = {
+    "1h": (60 * 60, 60 * 5),
+    "24h": (60 * 60 * 24, 60 * 60),
+    "7d": (60 * 60 * 24 * 7, 60 * 60),
+}
+TRENDING_MAX_RESULTS = 100
+TRENDING_REFRESH_INTERVAL = int(os.environ.get("TRENDING_REFRESH_INTERVAL", 30))
+TRENDING_CACHE_TIMEOUT = int(os.environ.get("TRENDING_CACHE_TIMEOUT", 60 * 10))
+
+# The pooled hasher keeps the pbkdf2_sha256 algorithm, so existing hashes
+# still verify; it must replace Django's PBKDF2PasswordHasher, not precede it.
+PASSWORD_HASHERS = [
+    'iam.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if TESTING:
+    # PBKDF2 is slow by design; tests hash with MD5 and still verify PBKDF2 hashes.
+    PASSWORD_HASHERS.insert(0, 'django.contrib.auth.hashers.MD5PasswordHasher')
+PASSWORD_HASHING_POOL_SIZE = int(os.environ.get("PASSWORD_HASHING_POOL_SIZE", os.cpu_count() or 1))
+PASSWORD_HASHING_BACKLOG = int(os.environ.get("PASSWORD_HASHING_BACKLOG", 32))
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -124,7 +204,7 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
+        'thoughts.renderers.CamelCaseFastPathJSONRenderer',
         'djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer'
     ),
 
@@ -134,12 +214,18 @@ REST_FRAMEWORK = {
         'djangorestframework_camel_case.parser.CamelCaseJSONParser',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        'iam.authentication.StatelessJWTAuthentication'
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 100
 }
 
+# Authenticated requests trust the token claims; rows needed as models are
+# cached per process, and revoked tokens are reloaded every few seconds.
+AUTH_USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", 1024))
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get("AUTH_USER_CACHE_TIMEOUT", 30))
+AUTH_DENYLIST_CACHE_TIMEOUT = int(os.environ.get("AUTH_DENYLIST_CACHE_TIMEOUT", 5))
+
 BROKER_URL = os.environ.get("BROKER_URL", "sqs://")
 
 AWS_SQS_REGION = os.environ.get("AWS_SQS_REGION", "us-east-1")
@@ -153,8 +239,78 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_ROUTES = {
     "iam.tasks.send_confirmation_email": {"queue": "emails"},
+    "iam.tasks.send_confirmation_emails": {"queue": "emails"},
+    "thoughts.tasks.index_pending_hashtags": {"queue": "hashtags"},
+    "thoughts.tasks.prune_hashtag_usage": {"queue": "hashtags"},
+    "thoughts.tasks.refresh_trending_hashtags": {"queue": "hashtags"},
+    "thoughts.tasks.reconcile_thought_counts": {"queue": "hashtags"},
+    "thoughts.tasks.fan_out_thoughts": {"queue": "feeds"},
+    "thoughts.tasks.backfill_follower_feed": {"queue": "feeds"},
+    "thoughts.tasks.trim_home_feeds": {"queue": "feeds"},
+    "thoughts.tasks.invalidate_owner_thoughts": {"queue": "feeds"},
+}
+CELERY_BEAT_SCHEDULE = {
+    "refresh-trending-hashtags": {
+        "task": "thoughts.tasks.refresh_trending_hashtags",
+        "schedule": TRENDING_REFRESH_INTERVAL,
+    },
+    "prune-hashtag-usage": {
+        "task": "thoughts.tasks.prune_hashtag_usage",
+        "schedule": 60 * 60,
+    },
+    "reconcile-thought-counts": {
+        "task": "thoughts.tasks.reconcile_thought_counts",
+        "schedule": 60 * 60 * 24,
+    },
+    "trim-home-feeds": {
+        "task": "thoughts.tasks.trim_home_feeds",
+        "schedule": 60 * 60,
+    },
+    "prune-revoked-tokens": {
+        "task": "iam.tasks.prune_revoked_tokens",
+        "schedule": 60 * 60,
+    },
 }
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://')
+# No caller reads task results; tasks that need one must opt in.
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ALWAYS_EAGER = TESTING or os.environ.get("CELERY_TASK_ALWAYS_EAGER", None) == "1"
+CELERY_TASK_EAGER_PROPAGATES = CELERY_TASK_ALWAYS_EAGER
+
+# "sync" indexes hashtags inside the request, "async" buffers the thoughts and the hashtags
+# queue indexes them in batches, at most HASHTAG_INDEXING_INTERVAL seconds later.
+HASHTAG_INDEXING = os.environ.get("HASHTAG_INDEXING", "sync")
+HASHTAG_INDEXING_BATCH_SIZE = int(os.environ.get("HASHTAG_INDEXING_BATCH_SIZE", 500))
+HASHTAG_INDEXING_INTERVAL = int(os.environ.get("HASHTAG_INDEXING_INTERVAL", 1))
+HASHTAGS_MAX_PER_THOUGHT = int(os.environ.get("HASHTAGS_MAX_PER_THOUGHT", 30))
+THOUGHTS_BULK_MAX = int(os.environ.get("THOUGHTS_BULK_MAX", 100))
+
+# Searches rank and return only the newest SEARCH_MAX_MATCHES thoughts matching
+# the query; older matches are never listed, whatever the page.
+SEARCH_MAX_MATCHES = int(os.environ.get("SEARCH_MAX_MATCHES", 200))
+
+# Home feeds keep the newest FEED_MAX_ENTRIES thoughts of followed accounts;
+# accounts with FEED_FANOUT_MAX_FOLLOWERS followers or more are read on demand.
+FEED_MAX_ENTRIES = int(os.environ.get("FEED_MAX_ENTRIES", 800))
+FEED_FANOUT_MAX_FOLLOWERS = int(os.environ.get("FEED_FANOUT_MAX_FOLLOWERS", 10000))
+FEED_FANOUT_BATCH_SIZE = int(os.environ.get("FEED_FANOUT_BATCH_SIZE", 1000))
+FEED_TRIM_BATCH_SIZE = int(os.environ.get("FEED_TRIM_BATCH_SIZE", 1000))
+
+# Confirmation emails are buffered and sent EMAIL_BATCH_SIZE at a time over
+# one connection, at most EMAIL_FLUSH_INTERVAL seconds after a signup.
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 25))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", None) == "1"
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "thoughts@localhost")
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 100))
+EMAIL_FLUSH_INTERVAL = int(os.environ.get("EMAIL_FLUSH_INTERVAL", 10))
+
+# Share of the requests whose timings are measured, sent back as a
+# Server-Timing header and logged.
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get("REQUEST_METRICS_SAMPLE_RATE", 1))
 
 LOGLEVEL = os.environ.get("LOGLEVEL", "INFO")
 LOGGING = {
@@ -0,0 +1,270 @@
+import threading
+import time
+from collections import Counter
+
+import psycopg2
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from psycopg2 import extensions
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from common.testing.builders import BulkHashtagBuilder, BulkThoughtBuilder, BulkUserBuilder, UserBuilder
+from thoughts.cache import get_or_compute
+from thoughts.models import HashtagThought, Thought
+from thoughtsapi.db.postgresql_pool.pool import ConnectionPool
+from thoughtsapi.db.routers import pinned_to_primary
+from thoughtsapi.middleware import PrimaryPinningMiddleware
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    databases = {'default'}
+
+    def build_pool(self, max_size=2, timeout=1, max_lifetime=60, check_after=30) -> ConnectionPool:
+        params = connection.get_connection_params()
+        pool = ConnectionPool(
+            lambda: psycopg2.connect(**params),
+            max_size=max_size,
+            timeout=timeout,
+            max_lifetime=max_lifetime,
+            check_after=check_after
+        )
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_should_reuse_released_connections(self):
+        pool = self.build_pool()
+        first = pool.acquire()
+        pool.release(first)
+
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(1, pool.snapshot()['opened'])
+        self.assertEqual(2, pool.snapshot()['checkouts'])
+        self.assertEqual(1, pool.snapshot()['in_use'])
+
+    def test_should_not_hand_out_more_than_max_size_connections(self):
+        pool = self.build_pool(max_size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.acquire()
+
+        self.assertEqual(1, pool.snapshot()['timeouts'])
+
+    def test_should_wait_for_a_connection_to_be_released(self):
+        pool = self.build_pool(max_size=1)
+        first = pool.acquire()
+        threading.Timer(0.05, pool.release, [first]).start()
+
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(1, pool.snapshot()['waits'])
+        self.assertGreater(pool.snapshot()['max_wait_time'], 0)
+
+    def test_should_replace_closed_connections(self):
+        pool = self.build_pool()
+        first = pool.acquire()
+        first.close()
+        pool.release(first)
+
+        second = pool.acquire()
+
+        self.assertIsNot(first, second)
+        self.assertFalse(second.closed)
+
+    def test_should_roll_back_transactions_left_open(self):
+        pool = self.build_pool()
+        first = pool.acquire()
+        with first.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertEqual(extensions.TRANSACTION_STATUS_INTRANS, first.get_transaction_status())
+        pool.release(first)
+
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(extensions.TRANSACTION_STATUS_IDLE, second.get_transaction_status())
+
+    def test_should_replace_connections_that_fail_the_health_check(self):
+        pool = self.build_pool(check_after=0)
+        first = pool.acquire()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [first.get_backend_pid()])
+        pool.release(first)
+
+        second = pool.acquire()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(1, pool.snapshot()['discarded'])
+
+    def test_should_close_connections_past_their_lifetime(self):
+        pool = self.build_pool(max_lifetime=0.01)
+        first = pool.acquire()
+        time.sleep(0.02)
+        pool.release(first)
+
+        self.assertTrue(first.closed)
+        self.assertEqual(0, pool.snapshot()['size'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.factory = RequestFactory()
+        self.read_from = []
+        self.middleware = PrimaryPinningMiddleware(self.record_read)
+
+    def record_read(self, request):
+        self.read_from.append(router.db_for_read(Thought))
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+    def authorization(self, user_id: int) -> dict:
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(User(id=user_id))}'}
+
+    def test_should_read_from_primary_outside_requests(self):
+        self.assertEqual('default', router.db_for_read(Thought))
+        self.assertEqual('default', router.db_for_write(Thought))
+
+    def test_should_read_from_replica_in_safe_requests(self):
+        self.middleware(self.factory.get('/api/thoughts'))
+        self.middleware(self.factory.get('/api/thoughts', **self.authorization(1)))
+
+        self.assertEqual(['replica0', 'replica0'], self.read_from)
+
+    def test_should_read_from_primary_in_requests_that_write(self):
+        self.middleware(self.factory.post('/api/thoughts'))
+
+        self.assertEqual(['default'], self.read_from)
+
+    def test_should_pin_a_user_to_primary_after_a_write(self):
+        self.middleware(self.factory.post('/api/thoughts', **self.authorization(1)))
+        self.middleware(self.factory.get('/api/thoughts', **self.authorization(1)))
+        self.middleware(self.factory.get('/api/thoughts', **self.authorization(2)))
+
+        self.assertEqual(['default', 'default', 'replica0'], self.read_from)
+
+    def test_should_fill_caches_from_primary(self):
+        with pinned_to_primary(False):
+            value = get_or_compute('test', 'replica:fill', lambda: router.db_for_read(Thought), 60)
+
+        self.assertEqual('default', value)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_should_read_from_primary_without_replicas(self):
+        self.middleware(self.factory.get('/api/thoughts'))
+
+        self.assertEqual(['default'], self.read_from)
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = UserBuilder().with_username('breninho')\
+                            .with_email('brenoninho@breno.com')\
+                            .build()
+        user.save()
+        Thought.objects.bulk_create(Thought(thought=f'Lorem ipsum {number}', owner=user) for number in range(100))
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('thought-list') + '?username=breninho'
+
+    def server_timing(self, response) -> dict:
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_should_send_back_server_timing(self):
+        response = self.client.get(self.url)
+
+        timing = self.server_timing(response)
+        self.assertEqual('"1 queries"', timing['db']['desc'])
+        self.assertEqual('"hits=0 misses=1"', timing['cache']['desc'])
+        self.assertGreater(float(timing['serialize']['dur']), 0)
+        self.assertGreater(float(timing['render']['dur']), 0)
+        self.assertGreaterEqual(float(timing['total']['dur']), float(timing['db']['dur']))
+
+    def test_should_count_cache_hits(self):
+        self.client.get(self.url)
+
+        response = self.client.get(self.url)
+
+        timing = self.server_timing(response)
+        self.assertEqual('"0 queries"', timing['db']['desc'])
+        self.assertEqual('"hits=1 misses=0"', timing['cache']['desc'])
+
+    def test_should_log_metrics_as_structured_fields(self):
+        with self.assertLogs('thoughtsapi.middleware', 'INFO') as logs:
+            self.client.get(self.url)
+
+        record = logs.records[-1]
+        self.assertEqual('thought-list', record.route)
+        self.assertEqual(200, record.status_code)
+        self.assertEqual(1, record.db_queries)
+        self.assertEqual(1, record.cache_misses)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_should_leave_requests_out_of_the_sample_alone(self):
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class BulkBuildersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_ids = BulkUserBuilder(20).with_prefix('bulk').with_password('secret').copy()
+        cls.hashtag_ids = BulkHashtagBuilder(10).copy()
+
+    def thoughts(self) -> BulkThoughtBuilder:
+        return BulkThoughtBuilder(500).with_owners(self.user_ids).with_hashtags(self.hashtag_ids).with_seed(7)
+
+    def test_should_copy_users_that_log_in_with_the_shared_password(self):
+        self.assertEqual(20, User.objects.filter(id__in=self.user_ids).count())
+
+        self.assertEqual(self.user_ids[3], authenticate(username='bulk3', password='secret').id)
+
+    def test_should_link_thoughts_to_their_hashtags(self):
+        thought_ids = self.thoughts().copy()
+
+        links = HashtagThought.objects.filter(thought_id__in=thought_ids).select_related('hashtag', 'thought')
+        self.assertEqual(500, len(links))
+        for link in links:
+            self.assertTrue(link.thought.thought.endswith(f'#{link.hashtag.hashtag}'))
+            self.assertEqual(link.thought.created_at, link.thought_created_at)
+
+    def test_should_draw_hashtags_with_a_zipfian_spread(self):
+        thought_ids = self.thoughts().copy()
+
+        uses = Counter(HashtagThought.objects.filter(thought_id__in=thought_ids).values_list('hashtag_id', flat=True))
+        self.assertGreater(uses[self.hashtag_ids[0]], 3 * uses[self.hashtag_ids[-1]])
+
+    def test_should_build_the_same_rows_with_create_and_copy(self):
+        builder = self.thoughts()
+        copied = builder.copy()
+        created = builder.create(batch_size=100)
+
+        def contents(ids):
+            return list(Thought.objects.filter(id__in=ids).order_by('id').values_list('owner_id', 'created_at'))
+        self.assertEqual(contents(copied), contents(created))
+        self.assertEqual(1000, HashtagThought.objects.count())
+
+    def test_should_escape_copied_text(self):
+        BulkUserBuilder(1).with_prefix('tab\tnew\nline\t').copy()
+
+        self.assertTrue(User.objects.filter(username='tab\tnew\nline\t0').exists())
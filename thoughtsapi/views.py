@@ -10,5 +10,7 @@ def api_root(request, format=None):
         '/api/token': reverse('token_obtain_pair', request=request, format=format),
         '/api/token/refresh': reverse('token_refresh', request=request, format=format),
         '/api/users': reverse('user-list', request=request, format=format),
-        '/api/thoughts': reverse('thought-list', request=request, format=format)
+        '/api/thoughts': reverse('thought-list', request=request, format=format),
+        '/api/feed': reverse('feed', request=request, format=format),
+        '/api/hashtags/trending': reverse('hashtag-trending', request=request, format=format)
     })